@@ -24,7 +24,7 @@ setuptools.setup(
     # install_requires=[
     #     'pandas'
     # ],
-    python_requires=">=3.6",
+    python_requires=">=3.8",
 )
 
 # Python release version syntax:
@@ -1 +1,14 @@
 from tests.test_portfolio import *
+
+from tests.test_checkpoint import *
+from tests.test_stock import *
+from tests.test_execution import *
+from tests.test_margin import *
+from tests.test_replay import *
+from tests.test_batch import *
+from tests.test_montecarlo import *
+from tests.test_cache import *
+from tests.test_risk import *
+from tests.test_optimizer import *
+from tests.test_actions import *
+from tests.test_orders import *
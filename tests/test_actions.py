@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework import stock as st
+
+class Test_CorporateActions(unittest.TestCase):
+
+    def setUp(self):
+
+        data = pd.DataFrame({
+            'open' : [200.0, 210.0, 100.0, 104.0, 100.0],
+            'high' : [200.0, 210.0, 100.0, 104.0, 100.0],
+            'low' : [200.0, 210.0, 100.0, 104.0, 100.0],
+            'close' : [200.0, 200.0, 100.0, 104.0, 100.0],
+            'volume' : [1000, 1000, 2000, 2000, 2000]
+        }, index=['2021-01-04', '2021-01-05', '2021-01-06', '2021-01-07', '2021-01-08'])
+
+        self.market_object = st.MarketObject('TEST', data)
+
+    def test_adjustment(self):
+
+        actions = self.market_object.actions
+
+        actions.add_dividend('2021-01-08', 4)
+        actions.add_split('2021-01-06', 2)
+
+        # The split halves the prices before it, and the dividend scales every price before it by 1 - 4 / 104
+        np.testing.assert_allclose(actions.get_factors(False), [0.5, 0.5, 1, 1, 1])
+        np.testing.assert_allclose(actions.get_factors(), [0.5 * 100 / 104] * 2 + [100 / 104] * 2 + [1])
+        np.testing.assert_allclose(actions.adjust('volume'), [2000, 2000, 2000, 2000, 2000])
+
+        adjusted = actions.adjusted(dividends=False)
+        np.testing.assert_allclose(adjusted['close'], [100, 100, 100, 104, 100])
+
+        # The stored prices are not changed
+        self.assertEqual(self.market_object.history_df['close'].iloc[0], 200)
+        self.assertEqual(list(actions.get_events()['split']), [2, 1])
+
+    def test_update_history(self):
+
+        actions = self.market_object.actions
+        actions.add_dividend('2021-01-08', 4)
+
+        # Overwriting the close before the dividend changes its factor
+        self.market_object.update_history(pd.DataFrame({'open' : [80.0], 'high' : [80.0], 'low' : [80.0], 'close' : [80.0], 'volume' : [2000]}, index=['2021-01-07']))
+        self.assertAlmostEqual(actions.get_factors()[0], 0.95)
+
+        # New bars after every event are not adjusted
+        self.market_object.update_history(pd.DataFrame({'open' : [90.0], 'high' : [90.0], 'low' : [90.0], 'close' : [90.0], 'volume' : [2000]}, index=['2021-01-11']))
+        np.testing.assert_allclose(actions.get_factors(), [0.95] * 4 + [1, 1])
+
+    def test_update_history_before_dividend(self):
+
+        actions = self.market_object.actions
+
+        # A dividend after the end of the history is measured against the last close until the bars before it arrive
+        actions.add_dividend('2021-01-13', 5)
+        np.testing.assert_allclose(actions.get_factors(), [0.95] * 5)
+
+        # Appending the bars before it measures the dividend against the new close
+        self.market_object.update_history(pd.DataFrame({'open' : [50.0] * 3, 'high' : [50.0] * 3, 'low' : [50.0] * 3, 'close' : [50.0] * 3, 'volume' : [2000] * 3}, index=['2021-01-11', '2021-01-12', '2021-01-13']))
+        np.testing.assert_allclose(actions.get_factors(), [0.9] * 7 + [1])
@@ -0,0 +1,51 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework import batch as bt
+from trading_algorithm_framework import execution as ex
+from trading_algorithm_framework import stock as st
+
+class Test_BatchPortfolio(unittest.TestCase):
+
+    def setUp(self):
+
+        data = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'AAPL_data.csv'), index_col=0).iloc[:100]
+        self.market_object = st.MarketObject('AAPL', data)
+
+        # Moving average crossover signals for a range of window lengths
+        close = data['close']
+        self.signals = np.array([np.where(close > close.rolling(window, min_periods=1).mean(), 10, -10) for window in range(2, 22)])
+
+    def test_run_matches_manual_calculation(self):
+
+        batch = bt.BatchPortfolio(len(self.signals), balance=10000)
+        equity = batch.run(self.market_object, self.signals)
+
+        # Check one portfolio against a simple loop
+        close = self.market_object.history_df['close'].to_numpy()
+        cash, position = 10000, 0
+
+        for t in range(len(close)):
+            cash -= (self.signals[3, t] - position) * close[t]
+            position = self.signals[3, t]
+
+        self.assertAlmostEqual(equity[3, -1], cash + position * close[-1])
+        self.assertAlmostEqual(batch.get_equity()[3], equity[3, -1])
+
+    def test_execution_model(self):
+
+        # A model without any costs or caps gives the same result as no model
+        expected = bt.BatchPortfolio(len(self.signals)).run(self.market_object, self.signals)
+        equity = bt.BatchPortfolio(len(self.signals), execution_model=ex.ExecutionModel()).run(self.market_object, self.signals)
+
+        np.testing.assert_allclose(equity, expected)
+
+        # Commission lowers the equity of every portfolio that traded
+        batch = bt.BatchPortfolio(len(self.signals), execution_model=ex.ExecutionModel(commission=1))
+        equity = batch.run(self.market_object, self.signals)
+
+        np.testing.assert_allclose(expected[:, -1] - equity[:, -1], batch.costs)
+        self.assertTrue((batch.costs > 0).all())
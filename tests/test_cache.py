@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from trading_algorithm_framework import cache as ca
+from trading_algorithm_framework import execution as ex
+from trading_algorithm_framework import portfolio as pf
+
+def total(values, scale=1):
+    return {'total' : values.sum() * scale}
+
+class Test_ResultCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.cache = ca.ResultCache(tempfile.mkdtemp())
+
+    def test_run(self):
+
+        values = np.arange(10.0)
+
+        self.assertEqual(self.cache.run(total, values), {'total' : 45})
+        self.assertEqual(self.cache.run(total, values), {'total' : 45})
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        # Changing the data or the parameters gives a new key
+        self.assertEqual(self.cache.run(total, values + 1), {'total' : 55})
+        self.assertEqual(self.cache.run(total, values, scale=2), {'total' : 90})
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+
+    def test_eviction(self):
+
+        cache = ca.ResultCache(self.cache.path, max_size=3000)
+
+        for key in ['a', 'b', 'c']:
+            cache.put(key, np.zeros(100))
+            time.sleep(0.01)
+
+        # Using 'a' makes 'b' the least recently used result
+        cache.get('a')
+        time.sleep(0.01)
+        cache.put('d', np.zeros(100))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('d'))
+
+    def test_make_key(self):
+
+        # Portfolios with different costs do not share a key
+        self.assertNotEqual(ca.make_key(pf.Portfolio(execution_model=ex.ExecutionModel(commission=5))), ca.make_key(pf.Portfolio()))
+
+        # Closures and lambdas with the same name are hashed by what they close over and their code
+        def make(scale):
+            return lambda values: values * scale
+
+        self.assertNotEqual(ca.make_key(make(1)), ca.make_key(make(2)))
+        self.assertEqual(ca.make_key(make(1)), ca.make_key(make(1)))
+        self.assertNotEqual(ca.make_key(lambda values: values + 1), ca.make_key(lambda values: values - 1))
+
+    def test_make_key_in_other_processes(self):
+
+        # Sets are hashed in the same order whatever the hash seed of the process
+        code = "from trading_algorithm_framework import cache as ca; print(ca.make_key({'symbols' : {'AAPL', 'MSFT', 'GOOG', 'AMZN'}, 'window' : frozenset([5, 'a'])}))"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        keys = {subprocess.run([sys.executable, '-c', code], env=dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root), capture_output=True, text=True, check=True).stdout for seed in ['0', '1', '2']}
+
+        self.assertEqual(len(keys), 1)
+
+        # Objects that can only be told apart by their address can not be hashed
+        with self.assertRaises(TypeError):
+            ca.make_key(np.random.default_rng(0))
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from trading_algorithm_framework import checkpoint as ck
+from trading_algorithm_framework import stock as st
+from trading_algorithm_framework import portfolio as pf
+
+class Test_Checkpoint(unittest.TestCase):
+
+    def setUp(self):
+
+        self.data = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'AAPL_data.csv'), index_col=0).iloc[:200]
+        self.path = os.path.join(tempfile.mkdtemp(), 'backtest.ckpt')
+
+    def run_backtest(self, portfolio, market_object, stop=None, checkpoint=None):
+
+        # Buy on every fifth bar, and sell the oldest position on every seventh bar
+        while market_object.has_next():
+            date, point = market_object.step()
+
+            if market_object.cursor % 5 == 0: portfolio.buy(market_object, 'long', date, 10)
+
+            positions = portfolio.positions.get('AAPL')
+            if market_object.cursor % 7 == 0 and positions and positions.positions['long']:
+                entry_datetime = list(positions.positions['long'].keys())[0]
+                portfolio.sell(market_object, 'long', entry_datetime, date, 10)
+
+            if checkpoint and market_object.cursor % 20 == 0: checkpoint.save(portfolio, market_object)
+            if market_object.cursor == stop: return
+
+    def test_resume_matches_uninterrupted_run(self):
+
+        # Run the backtest without interruption
+        expected = pf.Portfolio()
+        self.run_backtest(expected, st.MarketObject('AAPL', self.data))
+
+        # Run the backtest, stopping part way through as though the worker had died
+        checkpoint = ck.Checkpoint(self.path)
+        self.run_backtest(pf.Portfolio(), st.MarketObject('AAPL', self.data), stop=130, checkpoint=checkpoint)
+
+        # Resume the backtest with new instances
+        portfolio = pf.Portfolio()
+        market_object = st.MarketObject('AAPL', self.data)
+
+        checkpoint = ck.Checkpoint(self.path)
+        self.assertTrue(checkpoint.resume(portfolio, market_object))
+        self.assertEqual(market_object.cursor, 120)
+
+        self.run_backtest(portfolio, market_object, checkpoint=checkpoint)
+
+        self.assertEqual(portfolio.balance, expected.balance)
+        self.assertEqual(portfolio.exposure, expected.exposure)
+        self.assertEqual(portfolio.get_holdings(), expected.get_holdings())
+        self.assertEqual(
+            list(portfolio.positions['AAPL'].history['long'].keys()),
+            list(expected.positions['AAPL'].history['long'].keys())
+        )
+
+    def test_resume_without_checkpoint(self):
+
+        self.assertFalse(ck.Checkpoint(self.path).resume(pf.Portfolio()))
+
+    def test_resume_after_merged_history(self):
+
+        market_object = st.MarketObject('AAPL', self.data)
+        dates = market_object.get_dates()
+
+        portfolio = pf.Portfolio()
+        checkpoint = ck.Checkpoint(self.path)
+
+        portfolio.buy(market_object, 'long', dates[0], 10)
+        portfolio.buy(market_object, 'long', dates[1], 10)
+        portfolio.sell(market_object, 'long', dates[0], dates[2], 10)
+        checkpoint.save(portfolio)
+
+        # Leaving a second position at the same time merges it into the record that was already saved
+        portfolio.sell(market_object, 'long', dates[1], dates[2], 10)
+        checkpoint.save(portfolio)
+
+        resumed = pf.Portfolio()
+        ck.Checkpoint(self.path).resume(resumed)
+
+        self.assertEqual(resumed.positions['AAPL'].history['long'][dates[2]].volume, 20)
+        self.assertEqual(resumed.balance, portfolio.balance)
+
+    def test_only_changed_positions_are_appended(self):
+
+        market_object = st.MarketObject('AAPL', self.data)
+        dates = market_object.get_dates()
+
+        portfolio = pf.Portfolio()
+        checkpoint = ck.Checkpoint(self.path)
+
+        for date in dates[:150]: portfolio.buy(market_object, 'long', date, 10)
+        checkpoint.save(portfolio)
+        snapshot = os.path.getsize(self.path)
+
+        # Changing one position and leaving another only appends those positions
+        portfolio.sell(market_object, 'long', dates[0], dates[150], 10)
+        portfolio.sell(market_object, 'long', dates[1], dates[150], 5)
+        checkpoint.save(portfolio)
+
+        self.assertLess(os.path.getsize(self.path) - snapshot, snapshot / 10)
+
+        resumed = pf.Portfolio()
+        ck.Checkpoint(self.path).resume(resumed)
+
+        positions = resumed.positions['AAPL'].positions['long']
+        self.assertFalse(dates[0] in positions)
+        self.assertEqual(positions[dates[1]].volume, 5)
+        self.assertEqual(len(positions), 149)
+        self.assertEqual(resumed.balance, portfolio.balance)
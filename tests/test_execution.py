@@ -0,0 +1,68 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework import execution as ex
+from trading_algorithm_framework import stock as st
+from trading_algorithm_framework import portfolio as pf
+
+class Test_ExecutionModel(unittest.TestCase):
+
+    def test_fill_batch(self):
+
+        model = ex.ExecutionModel(commission=1, commission_bps=10, spread_bps=20, participation=0.1)
+
+        price, volume, commission = model.fill(
+            np.array([100.0, 100.0, 50.0]),
+            np.array([50, 500, 10]),
+            np.array([1000, 1000, 5]),
+            np.array([1, -1, 1])
+        )
+
+        # The second order is capped at 10% of the bar volume, and the third can not be filled at all
+        np.testing.assert_array_equal(volume, [50, 100, 0])
+        np.testing.assert_allclose(price, [100.1, 99.9, 50.05])
+        np.testing.assert_allclose(commission, [1 + 100.1 * 50 * 0.001, 1 + 99.9 * 100 * 0.001, 0])
+
+    def test_fill_batch_on_the_same_bar(self):
+
+        model = ex.ExecutionModel(impact_bps=100, participation=0.1)
+
+        # The first three orders are from one bar and share its cap of 100, while the last is from another bar
+        price, volume, commission = model.fill(100.0, np.array([60, 30, 50, 80]), np.array([1000, 1000, 1000, 1000]), 1, filled=np.array([0, 0, 0, 50]), bars=np.array([1, 1, 1, 2]))
+
+        np.testing.assert_array_equal(volume, [60, 30, 10, 50])
+        np.testing.assert_allclose(price, 100 * (1 + np.array([60, 90, 100, 100]) / 1000 * 100 / 10000))
+
+    def test_portfolio_round_trip(self):
+
+        data = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'AAPL_data.csv'), index_col=0).iloc[:2]
+        market_object = st.MarketObject('AAPL', data)
+
+        entry_datetime, entry = market_object.step()
+        exit_datetime, exit = market_object.step()
+
+        portfolio = pf.Portfolio(execution_model=ex.ExecutionModel(commission=5, spread_bps=10))
+        portfolio.buy(market_object, 'long', entry_datetime, 100)
+        portfolio.sell(market_object, 'long', entry_datetime, exit_datetime, 100)
+
+        expected = 50000 + (exit.close_price * 0.9995 - entry.close_price * 1.0005) * 100 - 10
+
+        self.assertAlmostEqual(portfolio.balance, expected)
+        self.assertEqual(portfolio.costs, 10)
+
+    def test_participation_per_bar(self):
+
+        data = pd.DataFrame({'open' : [100.0, 100.0], 'high' : [100.0, 100.0], 'low' : [100.0, 100.0], 'close' : [100.0, 100.0], 'volume' : [1000, 1000]}, index=['2021-01-04', '2021-01-05'])
+        market_object = st.MarketObject('TEST', data)
+        dates = market_object.get_dates()
+
+        portfolio = pf.Portfolio(execution_model=ex.ExecutionModel(participation=0.1))
+
+        # Repeated orders on the same bar share its cap, which is reset on the next bar
+        filled = [portfolio.buy(market_object, 'long', dates[0], 60) for i in range(3)]
+        self.assertEqual(filled, [60, 40, 0])
+
+        self.assertEqual(portfolio.sell(market_object, 'long', dates[0], dates[1], 100), 100)
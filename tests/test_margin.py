@@ -0,0 +1,132 @@
+import unittest
+
+import pandas as pd
+
+from trading_algorithm_framework import margin as mg
+from trading_algorithm_framework import execution as ex
+from trading_algorithm_framework import stock as st
+from trading_algorithm_framework import portfolio as pf
+
+class Test_MarginEngine(unittest.TestCase):
+
+    def setUp(self):
+
+        data = pd.DataFrame({
+            'open' : [100.0, 100.0, 150.0],
+            'high' : [100.0, 100.0, 150.0],
+            'low' : [100.0, 100.0, 150.0],
+            'close' : [100.0, 100.0, 150.0],
+            'volume' : [1000, 1000, 1000]
+        }, index=['2021-01-04', '2021-01-05', '2021-01-06'])
+
+        self.market_object = st.MarketObject('TEST', data)
+        self.dates = self.market_object.get_dates()
+
+    def test_buying_power(self):
+
+        engine = mg.MarginEngine()
+        portfolio = pf.Portfolio(balance=10000, margin_engine=engine)
+
+        # A cash account can not buy more than its balance
+        portfolio.buy(self.market_object, 'long', self.dates[0], 101)
+        self.assertEqual(engine.rejected, 1)
+
+        portfolio.buy(self.market_object, 'long', self.dates[0], 60)
+        portfolio.buy(self.market_object, 'long', self.dates[1], 50)
+
+        self.assertEqual(engine.rejected, 2)
+        self.assertEqual(engine.get_buying_power(portfolio), 4000)
+        self.assertEqual(engine.get_equity(portfolio), 10000)
+
+    def test_exposure_limits(self):
+
+        engine = mg.MarginEngine(long_margin=0.5, max_symbol_exposure=1)
+        portfolio = pf.Portfolio(balance=10000, margin_engine=engine)
+
+        portfolio.buy(self.market_object, 'long', self.dates[0], 101)
+        self.assertEqual(engine.rejected, 1)
+
+        portfolio.buy(self.market_object, 'long', self.dates[0], 100)
+        self.assertEqual(engine.get_symbol_exposure('TEST'), 10000)
+
+    def test_margin_call(self):
+
+        engine = mg.MarginEngine(short_margin=0.5)
+        portfolio = pf.Portfolio(balance=10000, margin_engine=engine)
+
+        # The equity of the account covers half of the value of a short position
+        portfolio.buy(self.market_object, 'short', self.dates[0], 201)
+        self.assertEqual(engine.rejected, 1)
+
+        portfolio.buy(self.market_object, 'short', self.dates[0], 150)
+        self.assertEqual(engine.get_requirement(), 7500)
+
+        # The price rises, so the short position loses money and needs more margin
+        engine.mark('TEST', self.market_object.history[self.dates[2]].close_price)
+        self.assertTrue(engine.in_margin_call(portfolio))
+
+        engine.liquidate(portfolio, [self.market_object], self.dates[2])
+
+        self.assertFalse(engine.in_margin_call(portfolio))
+        self.assertEqual(portfolio.positions['TEST'].positions['short'], dict())
+        self.assertEqual(portfolio.balance, 2500)
+
+    def test_rebuild(self):
+
+        engine = mg.MarginEngine(short_margin=1.5)
+        portfolio = pf.Portfolio(balance=10000, margin_engine=engine)
+
+        portfolio.buy(self.market_object, 'long', self.dates[0], 20)
+        portfolio.buy(self.market_object, 'short', self.dates[1], 10)
+        engine.mark('TEST', 150)
+
+        rebuilt = mg.MarginEngine(short_margin=1.5)
+        rebuilt.rebuild(portfolio, engine.get_marks())
+
+        self.assertEqual(rebuilt.get_equity(portfolio), engine.get_equity(portfolio))
+        self.assertEqual(rebuilt.get_requirement(), engine.get_requirement())
+        self.assertEqual(rebuilt.get_gross_exposure(), engine.get_gross_exposure())
+
+    def test_liquidate_by_requirement(self):
+
+        engine = mg.MarginEngine(long_margin=0.5, short_margin=1.5, maintenance=1)
+        portfolio = pf.Portfolio(balance=10000, margin_engine=engine)
+
+        flat = st.MarketObject('FLAT', pd.DataFrame({'open' : 100.0, 'high' : 100.0, 'low' : 100.0, 'close' : 100.0, 'volume' : 1000}, index=['2021-01-04', '2021-01-05', '2021-01-06']))
+
+        portfolio.buy(flat, 'long', self.dates[0], 60)
+        portfolio.buy(self.market_object, 'short', self.dates[0], 30)
+
+        # The long position has the larger value, but the short position requires more margin, so it is sold first
+        engine.mark('TEST', 150)
+        self.assertTrue(engine.in_margin_call(portfolio))
+        self.assertGreater(engine.get_symbol_requirement('TEST'), engine.get_symbol_requirement('FLAT'))
+
+        engine.liquidate(portfolio, [flat, self.market_object], self.dates[2])
+
+        self.assertEqual(portfolio.positions['TEST'].positions['short'], dict())
+        self.assertEqual(len(portfolio.positions['FLAT'].positions['long']), 1)
+
+    def test_commission_counts_against_buying_power(self):
+
+        engine = mg.MarginEngine()
+        portfolio = pf.Portfolio(balance=10000, execution_model=ex.ExecutionModel(commission=10), margin_engine=engine)
+
+        self.assertEqual(portfolio.buy(self.market_object, 'long', self.dates[0], 100), 0)
+        self.assertEqual(portfolio.buy(self.market_object, 'long', self.dates[0], 99), 99)
+        self.assertGreaterEqual(engine.get_buying_power(portfolio), 0)
+
+    def test_mark(self):
+
+        engine = mg.MarginEngine(short_margin=0.5)
+        portfolio = pf.Portfolio(balance=10000, margin_engine=engine)
+
+        portfolio.buy(self.market_object, 'short', self.dates[0], 150)
+
+        # Marking each bar leaves the short position once the rise in price causes a margin call
+        self.assertFalse(portfolio.mark(self.market_object, self.dates[1]))
+        self.assertTrue(portfolio.mark(self.market_object, self.dates[2]))
+
+        self.assertFalse(engine.in_margin_call(portfolio))
+        self.assertEqual(portfolio.positions['TEST'].positions['short'], dict())
+        self.assertEqual(portfolio.balance, 2500)
@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from trading_algorithm_framework import montecarlo as mc
+
+class Test_MonteCarlo(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.default_rng(0)
+
+        self.returns = rng.normal(0.0005, 0.01, 500)
+        self.trades = rng.normal(10, 100, 200)
+
+    def test_quantile_sketch(self):
+
+        values = np.random.default_rng(1).standard_normal(100000)
+
+        # Build the sketch from two halves in chunks, and then merge them
+        first, second = mc.QuantileSketch(), mc.QuantileSketch()
+        for chunk in np.split(values[:50000], 50): first.update(chunk)
+        for chunk in np.split(values[50000:], 50): second.update(chunk)
+
+        first.merge(second)
+
+        self.assertEqual(first.count(), 100000)
+        np.testing.assert_allclose(first.quantile([0.01, 0.5, 0.99]), np.quantile(values, [0.01, 0.5, 0.99]), atol=0.01)
+
+    def test_shuffle_keeps_final_balance(self):
+
+        results = mc.MonteCarlo(paths=2000, batch_size=500, seed=0).shuffle(self.trades, balance=10000)
+
+        self.assertAlmostEqual(results['balance'][0.05], 10000 + self.trades.sum())
+        self.assertAlmostEqual(results['balance'][0.95], 10000 + self.trades.sum())
+        self.assertLess(results['drawdown'][0.05], results['drawdown'][0.95])
+
+    def test_results_do_not_depend_on_workers(self):
+
+        expected = mc.MonteCarlo(paths=2000, batch_size=500, seed=0).bootstrap(self.returns)
+        results = mc.MonteCarlo(paths=2000, batch_size=500, seed=0, workers=2).bootstrap(self.returns)
+
+        self.assertEqual(results, expected)
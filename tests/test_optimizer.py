@@ -0,0 +1,138 @@
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework import optimizer as op
+from trading_algorithm_framework import stock as st
+from trading_algorithm_framework import portfolio as pf
+from trading_algorithm_framework import margin as mg
+
+class Test_Optimizer(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.default_rng(0)
+
+        index = pd.bdate_range('2020-01-01', periods=300)
+        market = rng.normal(0, 0.01, (300, 1))
+        returns = market * rng.uniform(0.5, 1.5, 6) + rng.normal(0.0005, 0.01, (300, 6)) * rng.uniform(0.5, 2, 6)
+
+        self.panel = pd.DataFrame(returns, index=index, columns=list('ABCDEF'))
+        self.window = returns[-60:]
+
+    def test_weights(self):
+
+        for method in ['inverse_vol', 'risk_parity', 'mean_variance']:
+            weights = op.Optimizer(method, lookback=60, max_weight=0.3).solve(self.panel)
+
+            self.assertEqual(len(weights), 12)
+            np.testing.assert_allclose(weights.sum(axis=1), 1)
+            self.assertTrue((weights.to_numpy() >= -1e-12).all())
+
+        # Inverse volatility weights only depend on the variance of each symbol
+        weights = op.Optimizer('inverse_vol', lookback=60).solve(self.panel, dates=[self.panel.index[-1]]).iloc[0]
+        expected = 1 / self.window.std(axis=0, ddof=1)
+        np.testing.assert_allclose(weights, expected / expected.sum())
+
+    def test_risk_parity(self):
+
+        weights = op.Optimizer('risk_parity', lookback=60, shrinkage=0).solve(self.panel, dates=[self.panel.index[-1]]).iloc[0].to_numpy()
+
+        # Each symbol adds the same amount of risk
+        contributions = weights * (np.cov(self.window, rowvar=False) @ weights)
+        np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-4)
+
+    def test_risk_parity_more_symbols_than_bars(self):
+
+        rng = np.random.default_rng(1)
+        returns = rng.normal(0, 0.01, (40, 1)) * rng.uniform(0.5, 1.5, 100) + rng.normal(0, 0.01, (40, 100)) * rng.uniform(0.5, 2, 100)
+        panel = pd.DataFrame(returns, index=pd.bdate_range('2020-01-01', periods=40))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            weights = op.Optimizer('risk_parity', lookback=30).solve(panel, dates=[panel.index[-1]]).iloc[0].to_numpy()
+
+        # The covariance is shrunk towards its diagonal, which keeps it invertible with more symbols than bars
+        covariance = np.cov(returns[-30:], rowvar=False)
+        covariance = 0.9 * covariance + 0.1 * np.diag(np.diag(covariance))
+
+        contributions = weights * (covariance @ weights)
+        np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-5)
+        self.assertGreater(weights.min(), 0.1 / 100)
+
+        # Running out of iterations gives a warning
+        with self.assertWarns(RuntimeWarning):
+            op.Optimizer('risk_parity', lookback=30, max_iter=1).solve(panel, dates=[panel.index[-1]])
+
+    def test_mean_variance(self):
+
+        optimizer = op.Optimizer('mean_variance', lookback=60, long_only=False, risk_aversion=5, shrinkage=0)
+        weights = optimizer.solve(self.panel, dates=[self.panel.index[-1]]).iloc[0].to_numpy()
+
+        # Compare against the closed form solution with the full covariance
+        covariance = np.cov(self.window, rowvar=False)
+        mean = self.window.mean(axis=0)
+
+        inverse_mean = np.linalg.solve(covariance, mean) / 5
+        inverse_ones = np.linalg.solve(covariance, np.ones(6))
+        expected = inverse_mean + (1 - inverse_mean.sum()) / inverse_ones.sum() * inverse_ones
+
+        np.testing.assert_allclose(weights, expected, rtol=1e-5)
+
+        # The iterative solver matches the closed form when the limits are loose
+        optimizer = op.Optimizer('mean_variance', lookback=60, long_only=False, max_weight=100, risk_aversion=5, shrinkage=0, max_iter=5000, tol=1e-10)
+        np.testing.assert_allclose(optimizer.solve(self.panel, dates=[self.panel.index[-1]]).iloc[0].to_numpy(), expected, rtol=1e-4)
+
+    def test_rebalance(self):
+
+        data = pd.DataFrame({
+            'open' : [100.0, 50.0],
+            'high' : [100.0, 50.0],
+            'low' : [100.0, 50.0],
+            'close' : [100.0, 50.0],
+            'volume' : [1000, 1000]
+        }, index=['2021-01-04', '2021-01-05'])
+
+        market_objects = [st.MarketObject('A', data), st.MarketObject('B', data)]
+        dates = market_objects[0].get_dates()
+
+        optimizer = op.Optimizer()
+        portfolio = pf.Portfolio(balance=10000)
+
+        orders = optimizer.rebalance(portfolio, market_objects, {'A' : 0.6, 'B' : 0.4}, dates[0])
+        self.assertEqual(orders, {'A' : 60, 'B' : 40})
+
+        # After the price halves the portfolio is worth 5000, so half of the position in A is sold
+        orders = optimizer.rebalance(portfolio, market_objects, {'A' : 0.3, 'B' : 0.7}, dates[1])
+        self.assertEqual(orders, {'A' : -30, 'B' : 30})
+
+        self.assertEqual(sum(share.volume for share in portfolio.positions['A'].positions['long'].values()), 30)
+        self.assertEqual(sum(share.volume for share in portfolio.positions['B'].positions['long'].values()), 70)
+        self.assertAlmostEqual(portfolio.balance, 0)
+
+    def test_rebalance_from_solve(self):
+
+        # Build market objects from the returns panel, and rebalance on every date returned by 'solve'
+        prices = 100 * (1 + self.panel[['A', 'B', 'C']]).cumprod()
+        market_objects = [st.MarketObject(symbol, pd.DataFrame({'open' : prices[symbol], 'high' : prices[symbol], 'low' : prices[symbol], 'close' : prices[symbol], 'volume' : 1000})) for symbol in prices]
+
+        optimizer = op.Optimizer(lookback=60)
+        portfolio = pf.Portfolio(balance=100000, margin_engine=mg.MarginEngine())
+
+        weights = optimizer.solve(op.get_returns_panel(market_objects))
+        self.assertGreater(len(weights), 1)
+
+        for date, row in weights.iterrows():
+            optimizer.rebalance(portfolio, market_objects, row, date)
+
+        self.assertEqual(portfolio.margin_engine.rejected, 0)
+        self.assertTrue(all(portfolio.positions[symbol].history['long'] for symbol in ['A', 'B', 'C']))
+
+        # Moving everything into one symbol sells the others first, including the symbols that are not given a weight
+        date = weights.index[-1]
+        optimizer.rebalance(portfolio, market_objects, {'A' : 0.9}, date)
+
+        self.assertEqual(portfolio.margin_engine.rejected, 0)
+        self.assertEqual([len(portfolio.positions[symbol].positions['long']) for symbol in ['B', 'C']], [0, 0])
@@ -0,0 +1,137 @@
+import unittest
+
+import pandas as pd
+
+from trading_algorithm_framework import orders as od
+from trading_algorithm_framework import stock as st
+from trading_algorithm_framework import portfolio as pf
+from trading_algorithm_framework import execution as ex
+
+class Test_OrderBook(unittest.TestCase):
+
+    def setUp(self):
+
+        # A bar that closes flat, a bar that closes down, and a bar that gaps down and closes up
+        data = pd.DataFrame({
+            'open' : [100.0, 98.0, 97.0],
+            'high' : [101.0, 99.0, 105.0],
+            'low' : [99.0, 95.0, 96.0],
+            'close' : [100.0, 96.0, 104.0],
+            'volume' : [1000, 1000, 1000]
+        }, index=['2021-01-04', '2021-01-05', '2021-01-06'])
+
+        self.market_object = st.MarketObject('TEST', data)
+        self.dates = self.market_object.get_dates()
+
+        self.portfolio = pf.Portfolio(balance=10000)
+        self.book = od.OrderBook(self.portfolio)
+
+    def get_volume(self, asset_type):
+        return sum(share.volume for share in self.portfolio.positions['TEST'].positions[asset_type].values())
+
+    def test_limit_orders(self):
+
+        filled = self.book.place(self.market_object, 10, limit_price=99.5)
+        resting = self.book.place(self.market_object, 10, limit_price=90)
+        expiring = self.book.place(self.market_object, 10, limit_price=97, expiry_datetime=self.dates[0])
+
+        self.assertEqual(self.book.match(self.market_object, self.dates[0]), [filled])
+        self.assertEqual(filled.fills, [(self.dates[0], 99.5, 10)])
+        self.assertEqual(self.portfolio.positions['TEST'].positions['long'][self.dates[0]].price, 99.5)
+
+        # The next bar reaches 97, but the order has expired
+        self.assertEqual(self.book.match(self.market_object, self.dates[1]), [])
+        self.assertEqual(expiring.status, 'expired')
+        self.assertEqual(self.book.get_orders(), [resting])
+
+        self.book.cancel(resting)
+        self.assertEqual(self.book.get_orders('TEST'), [])
+
+        # A sell limit below the open is filled at the open
+        order = self.book.place(self.market_object, -10, limit_price=96.5)
+        self.book.match(self.market_object, self.dates[2])
+
+        self.assertEqual(order.fills, [(self.dates[2], 97.0, 10)])
+        self.assertEqual(self.get_volume('long'), 0)
+        self.assertAlmostEqual(self.portfolio.balance, 10000 - 25)
+
+    def test_limit_orders_with_costs(self):
+
+        self.portfolio.execution_model = ex.ExecutionModel(spread_bps=20)
+        positions = self.portfolio.positions
+
+        buy = self.book.place(self.market_object, 10, limit_price=99.5)
+        sell = self.book.place(self.market_object, -10, limit_price=100.5)
+        self.book.match(self.market_object, self.dates[0])
+
+        # Limit orders are filled at their limits rather than past them by the spread
+        self.assertEqual([buy.status, sell.status], ['filled', 'filled'])
+        self.assertEqual(positions['TEST'].history['long'][self.dates[0]].entry_price, 99.5)
+        self.assertEqual(positions['TEST'].history['long'][self.dates[0]].exit_price, 100.5)
+
+        # The same goes for stop limit orders once they have been triggered, while stop orders still pay the spread
+        stop_limit = self.book.place(self.market_object, 5, order_type='stop_limit', stop_price=98.5, limit_price=98.55)
+        stop = self.book.place(self.market_object, -5, order_type='stop', stop_price=95)
+        self.book.match(self.market_object, self.dates[1])
+
+        self.assertEqual([stop_limit.status, stop.status], ['filled', 'filled'])
+        self.assertEqual(positions['TEST'].history['long'][self.dates[1]].entry_price, 98.55)
+        self.assertAlmostEqual(positions['TEST'].history['long'][self.dates[1]].exit_price, 95 * (1 - 10 / 10000))
+
+    def test_stop_orders(self):
+
+        # The bar rises from 98 to 99 first, so the stop limit is triggered at 98.5 and filled at 98 on the way down, before the sell stop
+        stop_limit = self.book.place(self.market_object, 5, 'stop_limit', limit_price=98, stop_price=98.5)
+        stop = self.book.place(self.market_object, -5, 'stop', stop_price=96)
+        untouched = self.book.place(self.market_object, 5, 'stop', stop_price=100)
+
+        self.assertEqual(self.book.match(self.market_object, self.dates[1]), [stop_limit, stop])
+
+        record = self.portfolio.positions['TEST'].history['long'][self.dates[1]]
+        self.assertEqual((record.entry_price, record.exit_price, record.volume), (98, 96, 5))
+        self.assertEqual(self.get_volume('short'), 0)
+
+        # The buy stop is filled when the next bar passes through it
+        self.book.match(self.market_object, self.dates[2])
+        self.assertEqual(untouched.fills, [(self.dates[2], 100.0, 5)])
+
+    def test_fills_on_the_same_bar(self):
+
+        for price in [99.5, 99.2]: self.book.place(self.market_object, 10, limit_price=price)
+        self.book.match(self.market_object, self.dates[0])
+
+        # Both fills are kept in one position at the average price
+        share = self.portfolio.positions['TEST'].positions['long'][self.dates[0]]
+        self.assertEqual((share.volume, share.price), (20, 99.35))
+
+        for price in [101.5, 102.5]: self.book.place(self.market_object, -10, limit_price=price)
+        self.book.match(self.market_object, self.dates[2])
+
+        record = self.portfolio.positions['TEST'].history['long'][self.dates[2]]
+        self.assertEqual(record.volume, 20)
+        self.assertAlmostEqual(self.portfolio.balance, 10000 + 10 * (101.5 + 102.5 - 99.5 - 99.2))
+
+    def test_only_crossing_orders_are_taken(self):
+
+        # A grid of orders far from the price are left in the book
+        for i in range(1000): self.book.place(self.market_object, 1, limit_price=50 + i * 0.01)
+        order = self.book.place(self.market_object, 1, limit_price=99)
+
+        self.assertEqual(self.book.match(self.market_object, self.dates[0]), [order])
+        self.assertEqual(len(self.book.get_orders()), 1000)
+
+    def test_cancelled_orders_are_removed(self):
+
+        resting = self.book.place(self.market_object, 1, limit_price=90)
+
+        # Replacing an order over and over does not leave every cancelled order in the book
+        for i in range(2000):
+            self.book.cancel(self.book.place(self.market_object, 1, limit_price=95, expiry_datetime=self.dates[2]))
+
+        books = self.book._OrderBook__books['TEST']
+        self.assertLessEqual(len(books['buy_limit']), 2)
+        self.assertLessEqual(len(self.book._OrderBook__expiries), 1)
+
+        self.assertEqual(self.book.get_orders(), [resting])
+        self.assertEqual(self.book.match(self.market_object, self.dates[1]), [])
+        self.assertTrue(resting.is_open())
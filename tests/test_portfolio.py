@@ -1,5 +1,9 @@
 import unittest
+
+import pandas as pd
+
 from trading_algorithm_framework import portfolio as pf
+from trading_algorithm_framework import stock as st
 
 class Test_Portfolio(unittest.TestCase):
 
@@ -12,4 +16,57 @@ class Test_Portfolio(unittest.TestCase):
 
         temp_id = test_share.get_id()
 
-        self.assertEqual(temp_id, 1)
\ No newline at end of file
+        self.assertEqual(temp_id, 1)
+
+    def test_options_at_the_same_time(self):
+
+        data = pd.DataFrame({'open' : [100.0, 110.0, 120.0], 'high' : [100.0, 110.0, 120.0], 'low' : [100.0, 110.0, 120.0], 'close' : [100.0, 110.0, 120.0], 'volume' : [1000] * 3}, index=['2021-01-04', '2021-01-05', '2021-01-06'])
+        market_object = st.MarketObject('TEST', data)
+        dates = market_object.get_dates()
+
+        portfolio = pf.Portfolio(balance=100000)
+
+        # Two calls entered on the same bar are held as one position, and a third call is entered on the next bar
+        portfolio.buy(market_object, 'call', dates[0], 1, expiry_datetime=dates[2])
+        portfolio.buy(market_object, 'call', dates[0], 1, expiry_datetime=dates[2])
+        portfolio.buy(market_object, 'call', dates[1], 1, expiry_datetime=dates[2])
+
+        self.assertEqual(portfolio.positions['TEST'].positions['call'][dates[0]].volume, 2)
+
+        # A call with a different expiry can not be held at the same entry datetime
+        with self.assertRaises(ValueError):
+            portfolio.buy(market_object, 'call', dates[0], 1, expiry_datetime=dates[1])
+
+        # Leaving every call on the same bar combines them into one record, without losing any of the returns
+        portfolio.sell_all(market_object, 'call', dates[2])
+
+        record = portfolio.positions['TEST'].history['call'][dates[2]]
+        self.assertEqual(record.volume, 3)
+        self.assertAlmostEqual(record.entry_price, 310 / 3)
+        self.assertEqual(record.expiry_datetime, dates[2])
+
+        self.assertAlmostEqual(portfolio.balance, 100000 + (20 * 2 + 10) * 100)
+
+    def test_statistics_are_updated_on_each_fill(self):
+
+        data = pd.DataFrame({'open' : 1.0, 'high' : 1.0, 'low' : 1.0, 'close' : [100.0, 104.0, 97.0, 110.0, 90.0, 101.0], 'volume' : 1000}, index=pd.bdate_range('2021-01-04', periods=6))
+        market_object = st.MarketObject('TEST', data)
+        dates = market_object.get_dates()
+
+        portfolio = pf.Portfolio(balance=100000)
+
+        for date, volume in zip(dates, [30, -10, -50, 40, 25, -15]):
+            portfolio.trade(market_object, volume, date)
+
+        portfolio.buy(market_object, 'call', dates[1], 2, expiry_datetime=dates[5])
+        portfolio.buy(market_object, 'put', dates[2], 1, expiry_datetime=dates[5])
+        portfolio.sell(market_object, 'call', dates[1], dates[4], 1)
+
+        # The statistics kept on each fill match those recalculated from every position and the whole history
+        asset = portfolio.positions['TEST']
+        exposure, returns = asset.exposure, asset.returns
+
+        asset.set_opmul(asset.get_opmul())
+
+        self.assertAlmostEqual(asset.exposure, exposure)
+        self.assertAlmostEqual(asset.returns, returns)
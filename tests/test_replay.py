@@ -0,0 +1,42 @@
+import asyncio
+import os
+import unittest
+
+import pandas as pd
+
+from trading_algorithm_framework import replay as rp
+from trading_algorithm_framework import stock as st
+
+class Test_Replay(unittest.TestCase):
+
+    def setUp(self):
+
+        data = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'AAPL_data.csv'), index_col=0).iloc[:50]
+        self.market_object = st.MarketObject('AAPL', data)
+
+    def test_replay_queue(self):
+
+        closes = []
+        client = asyncio.run(rp.run_replay(self.market_object, 'AAPL', lambda market_object, date, point: closes.append(point.close_price), maxsize=5))
+
+        self.assertEqual(client.stats.count, 50)
+        self.assertEqual(client.market_object.get_dates(), self.market_object.get_dates())
+        self.assertEqual(closes, [self.market_object.history[date].close_price for date in self.market_object.get_dates()])
+
+    def test_replay_socket(self):
+
+        async def run():
+            server = await rp.ReplayServer(self.market_object).serve()
+            client = rp.ReplayClient('AAPL', lambda market_object, date, point: None)
+
+            await client.connect('127.0.0.1', server.sockets[0].getsockname()[1])
+
+            server.close()
+            await server.wait_closed()
+
+            return client
+
+        client = asyncio.run(run())
+
+        self.assertEqual(client.stats.count, 50)
+        pd.testing.assert_frame_equal(client.market_object.history_df, self.market_object.history_df[client.market_object.history_df.columns], check_freq=False, check_names=False)
@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from trading_algorithm_framework import risk as rk
+
+class Test_RiskModel(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.default_rng(0)
+
+        self.symbols = ['A', 'B', 'C']
+        self.benchmark = rng.normal(0, 0.01, 300)
+        self.returns = 0.5 * self.benchmark[:, None] + rng.normal(0.001, 0.01, (300, 3))
+
+        self.model = rk.RiskModel(self.symbols, window=50, benchmark='INDEX')
+
+        for r, b in zip(self.returns, self.benchmark):
+            self.model.update(dict(zip(self.symbols, r)), b)
+
+    def test_rolling_moments(self):
+
+        window = np.column_stack([self.returns[-50:], self.benchmark[-50:]])
+
+        np.testing.assert_allclose(self.model.get_mean(), window.mean(axis=0))
+        np.testing.assert_allclose(self.model.get_covariance(), np.cov(window, rowvar=False), atol=1e-12)
+
+    def test_portfolio_risk(self):
+
+        weights = {'A' : 0.5, 'B' : 0.3, 'C' : -0.2}
+        w = np.array([0.5, 0.3, -0.2])
+
+        portfolio = self.returns[-50:] @ w
+        benchmark = self.benchmark[-50:]
+
+        self.assertAlmostEqual(self.model.volatility(weights), portfolio.std(ddof=1))
+        self.assertAlmostEqual(self.model.var(weights), 1.6448536 * portfolio.std(ddof=1) - portfolio.mean(), places=6)
+        self.assertAlmostEqual(self.model.var(weights, method='historical'), -np.quantile(portfolio, 0.05))
+        self.assertGreater(self.model.expected_shortfall(weights), self.model.var(weights))
+        self.assertAlmostEqual(self.model.beta(weights), np.cov(portfolio, benchmark)[0, 1] / benchmark.var(ddof=1))
@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework import stock as st
+
+class Test_MarketObject(unittest.TestCase):
+
+    def setUp(self):
+
+        # Build minute bars for the regular trading session over a few days
+        index = pd.date_range('2024-01-02 09:30', '2024-01-05 16:00', freq='1min')
+        index = index[(index.hour * 60 + index.minute >= 570) & (index.hour < 16)]
+
+        rng = np.random.default_rng(0)
+        close = 100 + rng.standard_normal(len(index)).cumsum() * 0.1
+
+        self.data = pd.DataFrame({
+            'open' : close + 0.05,
+            'high' : close + 0.1,
+            'low' : close - 0.1,
+            'close' : close,
+            'volume' : rng.integers(1, 100, len(index))
+        }, index=index)
+
+    def test_resample(self):
+
+        bars = st.MarketObject('TEST', self.data).resample('1h', offset='30min')
+        first_hour = self.data.iloc[:60]
+
+        self.assertEqual(bars.index[0], pd.Timestamp('2024-01-02 09:30'))
+        self.assertEqual(bars['open'].iloc[0], first_hour['open'].iloc[0])
+        self.assertEqual(bars['high'].iloc[0], first_hour['high'].max())
+        self.assertEqual(bars['low'].iloc[0], first_hour['low'].min())
+        self.assertEqual(bars['close'].iloc[0], first_hour['close'].iloc[-1])
+        self.assertEqual(bars['volume'].iloc[0], first_hour['volume'].sum())
+
+        # There are no bars outside of the trading session
+        self.assertEqual(len(bars), 4 * 7)
+
+    def test_resample_after_update_history(self):
+
+        market_object = st.MarketObject('TEST', self.data.iloc[:500])
+        market_object.resample('1h', offset='30min')
+        market_object.resample('1D')
+
+        market_object.update_history(self.data.iloc[500:])
+        expected = st.MarketObject('TEST', self.data)
+
+        pd.testing.assert_frame_equal(market_object.resample('1h', offset='30min'), expected.resample('1h', offset='30min'))
+        pd.testing.assert_frame_equal(market_object.resample('1D'), expected.resample('1D'))
+
+    def test_resample_right_labelled_after_update_history(self):
+
+        # Weekly and month end bars are labelled by the end of the interval rather than its start
+        index = pd.bdate_range('2024-01-01', periods=60)
+        data = pd.DataFrame({'open' : 1.0, 'high' : 2.0, 'low' : 0.5, 'close' : range(1, 61), 'volume' : 10}, index=index)
+
+        for interval in ['W', 'ME']:
+            market_object = st.MarketObject('TEST', data.iloc[:5])
+            market_object.resample(interval)
+
+            for i in range(5, 60):
+                market_object.update_history(data.iloc[i:i + 1])
+                market_object.resample(interval)
+
+            pd.testing.assert_frame_equal(market_object.resample(interval), st.MarketObject('TEST', data).resample(interval))
+
+    def test_update_history_out_of_order(self):
+
+        def make(dates, close):
+            return pd.DataFrame({'open' : close, 'high' : close, 'low' : close, 'close' : close, 'volume' : 10}, index=dates)
+
+        market_object = st.MarketObject('TEST', make(['2024-01-05', '2024-01-06', '2024-01-07'], 1.0))
+
+        # Backfill an earlier date, and then overwrite a date that is not the last one
+        market_object.update_history(make(['2024-01-01'], 2.0))
+        market_object.update_history(make(['2024-01-06'], 3.0))
+
+        dates = [pd.Timestamp(date) for date in ['2024-01-01', '2024-01-05', '2024-01-06', '2024-01-07']]
+
+        self.assertEqual(list(market_object.history_df.index), dates)
+        self.assertEqual(list(market_object.history_df['close']), [2.0, 1.0, 3.0, 1.0])
+        self.assertEqual(market_object.get_dates(), [date.to_pydatetime() for date in dates])
+        self.assertEqual([market_object.step()[1].close_price for i in range(4)], [2.0, 1.0, 3.0, 1.0])
+
+    def test_backfill_after_stepping(self):
+
+        data = pd.DataFrame({'open' : 1.0, 'high' : 1.0, 'low' : 1.0, 'close' : [1.0, 2.0, 3.0], 'volume' : 10}, index=['2024-01-05', '2024-01-06', '2024-01-07'])
+
+        market_object = st.MarketObject('TEST', data)
+        dates = market_object.get_dates()
+
+        self.assertEqual([market_object.step()[1].close_price for i in range(2)], [1.0, 2.0])
+
+        # Backfilling a date that was already passed does not step back over the dates already returned, and the list of dates is updated in place
+        market_object.update_history(pd.DataFrame({'open' : [5.0], 'high' : [5.0], 'low' : [5.0], 'close' : [5.0], 'volume' : [10]}, index=['2024-01-01']))
+
+        self.assertEqual(market_object.step()[1].close_price, 3.0)
+        self.assertFalse(market_object.has_next())
+        self.assertEqual(len(dates), 4)
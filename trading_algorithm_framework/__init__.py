@@ -1,3 +1,14 @@
 from trading_algorithm_framework.algorithm import *
 from trading_algorithm_framework.portfolio import *
-from trading_algorithm_framework.stock import *
\ No newline at end of file
+from trading_algorithm_framework.stock import *
+from trading_algorithm_framework.actions import *
+from trading_algorithm_framework.checkpoint import *
+from trading_algorithm_framework.execution import *
+from trading_algorithm_framework.margin import *
+from trading_algorithm_framework.replay import *
+from trading_algorithm_framework.batch import *
+from trading_algorithm_framework.montecarlo import *
+from trading_algorithm_framework.cache import *
+from trading_algorithm_framework.risk import *
+from trading_algorithm_framework.optimizer import *
+from trading_algorithm_framework.orders import *
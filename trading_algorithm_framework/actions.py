@@ -0,0 +1,184 @@
+# The file for adjusting the prices of a market object for splits and dividends
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework.validation import *
+
+#----------------
+# Corporate Actions Class
+#----------------
+
+class CorporateActions:
+    '''
+    Holds the splits and dividends of a market object as a sorted list of events, and adjusts its prices for them. Every MarketObject
+    has one of these as its 'actions' attribute, so it does not normally need to be created directly.
+
+    Prices are back adjusted, so the prices before each event are scaled to line up with the prices after it, and the latest prices are
+    left as they are. Only the factor of each event and the running product of the factors are stored, rather than a factor for every
+    bar. Adjusted prices are calculated from the raw prices in the history of the market object whenever they are asked for, and are
+    never stored, so the raw prices are never copied or changed. When an event is added, only the products for the events after it are
+    recalculated.
+
+    Takes 1 argument:
+
+    - market_object : The instance of the MarketObject class whose prices are adjusted.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, market_object):
+
+        self.market_object = market_object
+
+        # Declare the date, split ratio and dividend amount of each event, in date order
+        self.__dates = np.empty(0, dtype='datetime64[ns]')
+        self.__ratios = np.empty(0)
+        self.__amounts = np.empty(0)
+
+        # Declare the price factor of each event, and the running products of the factors from the first event onwards. The product
+        # before event k is held at index k, so the product of every factor is held at the end.
+        self.__factors = np.empty(0)
+        self.__splits = np.ones(1)
+        self.__prices = np.ones(1)
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __to_datetime(self, date, date_format):
+        if type(date) == str: date = datetime.strptime(date, date_format)
+        return np.datetime64(pd.Timestamp(date).to_datetime64(), 'ns')
+
+    def __dividend_factor(self, k):
+
+        # A dividend lowers the price by its amount on its date, so the earlier prices are scaled by one minus the dividend over the last close before it
+        if self.__amounts[k] == 0: return 1.0
+
+        i = self.market_object.get_index().searchsorted(self.__dates[k], side='left')
+
+        # If there are no prices before the dividend then there is nothing to adjust
+        if i == 0: return 1.0
+
+        close = self.market_object.get_column('close')[i - 1]
+        if self.__amounts[k] >= close: raise ValueError(f'Dividend {self.__amounts[k]} must be less than the close {close} before it!') from None
+
+        return 1 - self.__amounts[k] / close
+
+    def __update(self, start):
+
+        # Recalculate the running products from event 'start' onwards, leaving the events before it alone
+        self.__splits = np.concatenate([self.__splits[:start + 1], self.__splits[start] * np.cumprod(1 / self.__ratios[start:])])
+        self.__prices = np.concatenate([self.__prices[:start + 1], self.__prices[start] * np.cumprod(self.__factors[start:] / self.__ratios[start:])])
+
+    def __add(self, date, ratio, amount):
+
+        # Insert the event after any other events on the same date
+        k = int(self.__dates.searchsorted(date, side='right'))
+
+        self.__dates = np.insert(self.__dates, k, date)
+        self.__ratios = np.insert(self.__ratios, k, ratio)
+        self.__amounts = np.insert(self.__amounts, k, amount)
+        self.__factors = np.insert(self.__factors, k, 1.0)
+
+        self.__factors[k] = self.__dividend_factor(k)
+
+        self.__update(k)
+
+    def __expand(self, products):
+
+        # Each event scales every bar before its date, so the factor for a bar is the product of every factor divided by the product before its first later event
+        index = self.market_object.get_index()
+        positions = index.searchsorted(self.__dates, side='left')
+
+        return np.repeat(products[-1] / products, np.diff(positions, prepend=0, append=len(index)))
+
+    #----------------
+    # Getters & Setters
+    #----------------
+
+    def get_events(self):
+        return pd.DataFrame({'split' : self.__ratios, 'dividend' : self.__amounts, 'factor' : self.__factors / self.__ratios}, index=pd.DatetimeIndex(self.__dates, name='date'))
+
+    def get_factors(self, dividends=True):
+        '''
+        Returns a numpy array of the factor that each price in the history is multiplied by to adjust it, in the order of 'history_df'. Takes 1 argument:
+
+        - dividends (optional) : Set to False to only adjust for splits. Set to True by default.
+        '''
+        return self.__expand(self.__prices if dividends else self.__splits)
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def add_split(self, date, ratio, date_format='%Y-%m-%d'):
+        '''
+        Add a split, which scales every price before its date by one over its ratio and every volume by its ratio. Takes 3 arguments:
+
+        - date : The first date that trades at the new price, as a datetime object or a string;
+        - ratio : The number of new shares for each old share, e.g. 2 for a two for one split, or 0.1 for a one for ten reverse split;
+        - date_format (optional) : Denotes the arrangement of the date if it is a string. Set to '%Y-%m-%d' by default.
+        '''
+        gt_zero(ratio)
+        self.__add(self.__to_datetime(date, date_format), float(ratio), 0.0)
+
+    def add_dividend(self, date, amount, date_format='%Y-%m-%d'):
+        '''
+        Add a dividend, which scales every price before its date by one minus its amount over the close before its date. Takes 3 arguments:
+
+        - date : The ex-dividend date, as a datetime object or a string;
+        - amount : The cash paid for each share, in the same units as the raw close before the date;
+        - date_format (optional) : Denotes the arrangement of the date if it is a string. Set to '%Y-%m-%d' by default.
+        '''
+        gt_zero(amount)
+        self.__add(self.__to_datetime(date, date_format), 1.0, float(amount))
+
+    def refresh(self, date):
+        '''
+        Recalculate the dividends after a date, once the prices from that date onwards have changed. This is called by 'update_history'
+        whenever new prices are added to the history or existing prices are overwritten. Takes 1 argument:
+
+        - date : The earliest date whose prices have changed.
+        '''
+        k = int(self.__dates.searchsorted(np.datetime64(pd.Timestamp(date).to_datetime64(), 'ns'), side='right'))
+        if k == len(self.__dates): return
+
+        # Each dividend depends on the close before it, which can only have changed for the dividends after the date
+        for i in range(k, len(self.__dates)): self.__factors[i] = self.__dividend_factor(i)
+
+        self.__update(k)
+
+    def adjust(self, column, dividends=True):
+        '''
+        Returns a numpy array of one column of the history, adjusted for every event. Takes 2 arguments:
+
+        - column : Either 'volume', 'close', 'open', 'low' or 'high';
+        - dividends (optional) : Set to False to only adjust for splits. Set to True by default.
+        '''
+        values = self.market_object.get_column(column).astype(float)
+
+        # Volumes are only adjusted for splits, and in the opposite direction to the prices
+        if column == 'volume': return values / self.get_factors(False)
+
+        return values * self.get_factors(dividends)
+
+    def adjusted(self, dividends=True):
+        '''
+        Returns a dataframe of the history adjusted for every event, with the same index and columns as 'history_df'. Takes 1 argument:
+
+        - dividends (optional) : Set to False to only adjust for splits. Set to True by default.
+        '''
+        history_df = self.market_object.history_df
+        factors, splits = self.get_factors(dividends), self.get_factors(False)
+
+        return pd.DataFrame({
+            'volume' : history_df['volume'].to_numpy(dtype=float) / splits,
+            'close' : history_df['close'].to_numpy(dtype=float) * factors,
+            'open' : history_df['open'].to_numpy(dtype=float) * factors,
+            'low' : history_df['low'].to_numpy(dtype=float) * factors,
+            'high' : history_df['high'].to_numpy(dtype=float) * factors
+        }, index=history_df.index)
@@ -0,0 +1,140 @@
+# The file for simulating many portfolios at once
+import numpy as np
+
+from trading_algorithm_framework.validation import *
+
+#----------------
+# Batch Portfolio Class
+#----------------
+
+class BatchPortfolio:
+    '''
+    Create a batch of portfolios that are simulated together, for example one for each parameter set in a sweep. The state of every
+    portfolio is held in numpy arrays, so one pass over the bars of a MarketObject advances all of them at once.
+
+    Takes 4 arguments:
+
+    - n : The number of portfolios in the batch;
+    - balance (optional) : The money that each portfolio begins with. Set to 50 000 by default;
+    - symbols (optional) : A list containing all of the symbols that the portfolios trade with. Set to nothing by default, and symbols are added when they are first run;
+    - execution_model (optional) : An instance of the ExecutionModel class used to fill every order. Set to None by default, which fills every order in full at the close price without any costs.
+
+    The state of the batch is held in the following arrays, where N is the number of portfolios and S is the number of symbols:
+
+    - balance : The cash held by each portfolio, with shape [N];
+    - position : The signed number of units held in each symbol, with shape [N, S]. Short positions are negative;
+    - exposure : The value of the positions held by each portfolio at the last close price, with shape [N];
+    - costs : The total commission paid by each portfolio, with shape [N].
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, n, balance=50000, symbols=None, execution_model=None):
+
+        # Validation
+        type_check(int, n)
+        gt_zero(n, balance)
+
+        if symbols: type_check(str, *symbols)
+
+        self.n = n
+        self.execution_model = execution_model
+
+        # Declare the state of each portfolio
+        self.symbols = []
+        self.balance = np.full(n, float(balance))
+        self.position = np.zeros((n, 0))
+        self.exposure = np.zeros(n)
+        self.costs = np.zeros(n)
+
+        # Declare the last close price of each symbol, which the positions are valued at
+        self.__prices = np.zeros(0)
+
+        # Add the symbols if the user passed in a list
+        if type(symbols) == list:
+            for symbol in symbols:
+                self.add_symbol(symbol)
+
+    #----------------
+    # Getters & Setters
+    #----------------
+
+    def get_equity(self):
+        return self.balance + self.exposure
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def add_symbol(self, symbol):
+        '''
+        Add a new symbol to the batch, if it does not exist already. Returns the column of the symbol in 'position'. Takes 1 argument:
+
+        - symbol : The name of the symbol to be added.
+        '''
+        if not(symbol in self.symbols):
+            self.symbols.append(symbol)
+            self.position = np.hstack([self.position, np.zeros((self.n, 1))])
+            self.__prices = np.append(self.__prices, 0.0)
+
+        return self.symbols.index(symbol)
+
+    def run(self, market_object, signals):
+        '''
+        Advance every portfolio over the bars of a market object. At each bar, every portfolio trades at the close price to reach the
+        position given by its signal. Returns the equity of every portfolio at each bar, with shape [N, T]. Takes 2 arguments:
+
+        - market_object : The instance of the MarketObject class to trade;
+        - signals : The target position for each portfolio at each bar, with shape [N, T] where T is the number of bars in the market object. Positive values are long positions and negative values are short positions.
+
+        Positions in any other symbols are held at their last close price while this market object is run.
+        '''
+
+        # Get the prices and volumes for each bar
+        close = market_object.history_df['close'].to_numpy(dtype=float)
+        bar_volume = market_object.history_df['volume'].to_numpy(dtype=float)
+
+        # Validation
+        signals = np.asarray(signals, dtype=float)
+        if signals.shape != (self.n, len(close)): raise ValueError(f'Signals must have shape {(self.n, len(close))}, not {signals.shape}!') from None
+
+        j = self.add_symbol(market_object.get_symbol())
+
+        # The value of the positions in every other symbol does not change
+        other = self.exposure - self.position[:, j] * self.__prices[j]
+
+        # Without an execution model every order is filled in full, so the whole run can be calculated at once
+        if self.execution_model == None:
+            trades = np.diff(signals, axis=1, prepend=self.position[:, j:j + 1])
+            cash = self.balance[:, None] - np.cumsum(trades * close, axis=1)
+            equity = cash + signals * close + other[:, None]
+
+            self.balance = cash[:, -1]
+            self.position[:, j] = signals[:, -1]
+
+        # Otherwise each order may only be partly filled, so step through the bars one at a time
+        else:
+            equity = np.empty(signals.shape)
+            position = self.position[:, j].copy()
+
+            for t in range(len(close)):
+                delta = signals[:, t] - position
+                side = np.sign(delta)
+
+                price, volume, commission = self.execution_model.fill(close[t], np.abs(delta), bar_volume[t], side)
+
+                position += side * volume
+                self.balance -= side * volume * price + commission
+                self.costs += commission
+
+                equity[:, t] = self.balance + position * close[t] + other
+
+            self.position[:, j] = position
+
+        # Value the positions at the last close
+        self.__prices[j] = close[-1]
+        self.exposure = other + self.position[:, j] * close[-1]
+
+        return equity
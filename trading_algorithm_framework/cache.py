@@ -0,0 +1,308 @@
+# The file for caching the results of backtests on disk
+import glob
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import types
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework.validation import *
+from trading_algorithm_framework.stock import *
+from trading_algorithm_framework.portfolio import *
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+#----------------
+# Functions
+#----------------
+
+# The hash of the framework source code, which is calculated once
+_code_version = None
+
+def get_code_version():
+    '''
+    Returns a hash of the source code of the framework, so that cached results are not reused after the code has changed.
+    '''
+    global _code_version
+
+    if _code_version == None:
+        h = hashlib.sha256()
+
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+            with open(path, 'rb') as f: h.update(f.read())
+
+        _code_version = h.hexdigest()
+
+    return _code_version
+
+def _update_hash(h, value, seen=None):
+
+    # Keep track of the objects that are being hashed further up, so that objects which refer to themselves do not recurse forever
+    seen = set() if seen == None else seen
+
+    if id(value) in seen:
+        h.update(b'<recursive>')
+        return
+
+    seen.add(id(value))
+
+    try:
+        _hash_value(h, value, seen)
+    finally:
+        seen.discard(id(value))
+
+def _digest(value, seen):
+
+    # Hash a value on its own, so that the items of sets and dictionaries can be put in an order that does not depend on the process
+    h = hashlib.sha256()
+    _update_hash(h, value, seen)
+
+    return h.digest()
+
+def _hash_value(h, value, seen):
+
+    # Add the type first, so that equal values of different types do not share a hash
+    h.update(type(value).__name__.encode())
+
+    if isinstance(value, MarketObject):
+        h.update(value.get_symbol().encode())
+        _update_hash(h, value.history_df[['volume', 'close', 'open', 'low', 'high']], seen)
+        _update_hash(h, value.actions.get_events(), seen)
+
+    elif isinstance(value, pd.DataFrame) or isinstance(value, pd.Series):
+        h.update(pickle.dumps(list(value.columns) if isinstance(value, pd.DataFrame) else value.name))
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+
+    elif isinstance(value, np.ndarray):
+        h.update(str((value.dtype, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+
+    elif isinstance(value, Portfolio):
+        _update_hash(h, value.get_state(), seen)
+        h.update(pickle.dumps({symbol : asset.positions for symbol, asset in sorted(value.positions.items())}))
+
+        # The closed positions, and the models that decide how orders are filled, also change the results
+        _update_hash(h, {symbol : asset.history for symbol, asset in value.positions.items()}, seen)
+        _update_hash(h, value.execution_model, seen)
+        _update_hash(h, value.margin_engine, seen)
+
+    elif isinstance(value, dict):
+        for key, item in sorted(((_digest(key, seen), item) for key, item in value.items()), key=lambda pair: pair[0]):
+            h.update(key)
+            _update_hash(h, item, seen)
+
+    elif isinstance(value, (set, frozenset)):
+        h.update(str(len(value)).encode())
+        for item in sorted(_digest(item, seen) for item in value): h.update(item)
+
+    elif isinstance(value, (list, tuple)):
+        h.update(str(len(value)).encode())
+        for item in value: _update_hash(h, item, seen)
+
+    elif isinstance(value, types.CodeType):
+        h.update(value.co_code)
+        h.update(repr(value.co_names).encode())
+        _update_hash(h, value.co_consts, seen)
+
+    elif callable(value) and hasattr(value, '__qualname__'):
+        h.update(f'{value.__module__}.{value.__qualname__}'.encode())
+
+        # Functions are also hashed by their code, default arguments and the values they close over, so that lambdas and closures with
+        # the same name do not share a hash
+        if isinstance(value, types.FunctionType):
+            _update_hash(h, value.__code__, seen)
+            _update_hash(h, value.__defaults__, seen)
+            _update_hash(h, value.__kwdefaults__, seen)
+
+            for cell in value.__closure__ or ():
+                try:
+                    _update_hash(h, cell.cell_contents, seen)
+                except ValueError:
+                    h.update(b'<empty>')
+
+        # A bound method also depends on the instance that it belongs to
+        if hasattr(value, '__self__') and not(type(value.__self__).__name__ == 'module'): _update_hash(h, value.__self__, seen)
+
+    elif hasattr(value, '__dict__'):
+        _update_hash(h, vars(value), seen)
+
+    else:
+        text = repr(value)
+
+        # The default repr holds the address of the object, which changes in every process, so it can not be used as a key
+        if re.search(' at 0x[0-9a-fA-F]+', text): raise TypeError(f'Objects of type {type(value).__name__} can not be hashed, as they have no attributes or repr to hash!') from None
+
+        h.update(text.encode())
+
+def make_key(*inputs):
+    '''
+    Returns a key for a set of inputs, made by hashing each of them along with the framework source code. Market objects and dataframes are hashed by their data, arrays by their contents, portfolios by their balance, positions, history and models, functions by their name, code, defaults and closed over values, sets by their items in an order that does not depend on the process, and other objects by their attributes or repr. Objects that can only be told apart by their address, such as numpy random generators, raise a TypeError.
+    '''
+    h = hashlib.sha256(get_code_version().encode())
+
+    for value in inputs: _update_hash(h, value)
+
+    return h.hexdigest()
+
+#----------------
+# Result Cache
+#----------------
+
+class ResultCache:
+    '''
+    Create a new cache to store the results of backtests on disk, so that a backtest with the same inputs does not need to be run again.
+    Each result is stored in its own file named by the hash of its inputs, and the least recently used results are removed once the
+    cache grows past its maximum size. The cache may be shared between processes, which lock the cache while writing to it.
+
+    Takes 2 arguments:
+
+    - path : The directory that the cache is stored in. It is created if it does not exist;
+    - max_size (optional) : The largest total size of the cached results in bytes. Set to 1 GB by default.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, path, max_size=2**30):
+
+        # Validation
+        type_check(str, path)
+        gt_zero(max_size)
+
+        self.path = path
+        self.max_size = max_size
+
+        # Count the number of hits and misses
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __file(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    @contextmanager
+    def __lock(self):
+
+        # Hold an exclusive lock on the lock file
+        with open(os.path.join(self.path, '.lock'), 'a+b') as f:
+            if fcntl != None: fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+            try:
+                yield
+            finally:
+                if fcntl != None: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def __evict(self):
+
+        # Find every cached result, ordered from the least recently used
+        files = []
+        for path in glob.glob(os.path.join(self.path, '*.pkl')):
+            try:
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                pass
+
+        files.sort()
+        size = sum(file[1] for file in files)
+
+        # Remove results until the cache is small enough
+        for mtime, file_size, path in files:
+            if size <= self.max_size: return
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            size -= file_size
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def get(self, key, default=None):
+        '''
+        Returns the result stored for a key, or the default if there is no result. Takes 2 arguments:
+
+        - key : The key returned by 'make_key';
+        - default (optional) : The value returned if there is no result. Set to None by default.
+        '''
+        path = self.__file(key)
+
+        try:
+            with open(path, 'rb') as f: result = pickle.load(f)
+
+            # Mark the result as recently used
+            os.utime(path)
+
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        '''
+        Store a result, such as an equity curve, trade journal, or dictionary of metrics. Takes 2 arguments:
+
+        - key : The key returned by 'make_key';
+        - result : Any result that can be pickled.
+        '''
+
+        # Write to a temporary file first, so that other processes never read a half written result
+        handle, temp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+
+        with os.fdopen(handle, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self.__lock():
+            os.replace(temp, self.__file(key))
+            self.__evict()
+
+    def run(self, function, *args, **kwargs):
+        '''
+        Returns the result of calling a function with the given arguments, running it only if there is no cached result for the same function and arguments. Takes 3 arguments:
+
+        - function : The function that runs the backtest. Functions are hashed by their name, code, default arguments and the values they close over, and bound methods are also hashed by the attributes of their instance. Global variables that the function reads are not hashed, so anything else that changes the result should be passed in as an argument;
+        - args : The arguments passed to the function;
+        - kwargs : The keyword arguments passed to the function.
+        '''
+        key = make_key(function, args, kwargs)
+        result = self.get(key, self)
+
+        # The cache itself is used to mark a miss, since None may be a valid result
+        if result is self:
+            result = function(*args, **kwargs)
+            self.put(key, result)
+
+        return result
+
+    def clear(self):
+        '''
+        Remove every cached result.
+        '''
+        with self.__lock():
+            for path in glob.glob(os.path.join(self.path, '*.pkl')): os.remove(path)
@@ -0,0 +1,293 @@
+# The file for saving and resuming the state of long running backtests
+import os
+import pickle
+from itertools import islice
+
+from trading_algorithm_framework.validation import *
+from trading_algorithm_framework.portfolio import *
+
+#----------------
+# Checkpoint Class
+#----------------
+
+class Checkpoint:
+    '''
+    Create a new checkpoint file to save the state of a backtest, so that it can be resumed if the run is interrupted. Takes 1 argument:
+
+    - path : The path to the checkpoint file.
+
+    The file is a sequence of pickled records. The first call to 'save' writes a full snapshot of the portfolio, and every call after that
+    only appends the state that has changed since the last save. New entries in the history of each StockAsset are appended, along with the
+    open positions that were entered or changed and the entry datetimes of the positions that were left. Once the appended records grow
+    larger than the snapshot, the next save rewrites the file as a new snapshot.
+
+    A typical backtest will look something like this:
+
+        checkpoint = Checkpoint('backtest.ckpt')
+        checkpoint.resume(pf, aapl_stock)
+
+        while aapl_stock.has_next():
+            date, point = aapl_stock.step()
+            ...
+            if aapl_stock.cursor % 1000 == 0: checkpoint.save(pf, aapl_stock)
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, path):
+
+        # Validation
+        type_check(str, path)
+
+        self.path = path
+
+        # Store what was last written, so that we only write what has changed
+        self.__reset()
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __reset(self):
+
+        # The account level state of the portfolio
+        self.__state = None
+
+        # For each symbol, the StockAsset instance, its revision, the length of each of its history dictionaries, its number of merges,
+        # and the price and volume of each of its open positions
+        self.__assets = dict()
+
+        # The size of the last snapshot, and the size of the records appended since
+        self.__snapshot_size = 0
+        self.__appended_size = 0
+
+        # The cursor for each market object
+        self.__cursors = dict()
+
+    def __marks(self, asset):
+
+        # Describe each open position by its object, price and volume, so that positions changed in place can be found
+        return {key : {entry_datetime : (id(share), share.price, share.volume) for entry_datetime, share in positions.items()} for key, positions in asset.positions.items()}
+
+    def __asset_record(self, symbol, asset):
+
+        # Get the last written values for this symbol, if there are any
+        written = self.__assets.get(symbol)
+        full = written == None or written[0] is not asset
+
+        # Nothing has changed since the last save
+        if not(full) and written[1] == asset.revision: return None
+
+        marks = self.__marks(asset)
+
+        # A merge moves the merged history entry to the end, so each merge adds one more entry to write from the end of the history.
+        # The entries are taken from the end without copying the rest of the history.
+        if full:
+            counts = {key : len(asset.history[key]) for key in asset.history}
+        else:
+            counts = {key : min(len(asset.history[key]), len(asset.history[key]) - written[2][key] + asset.merges - written[3]) for key in asset.history}
+
+        history = {key : list(reversed(list(islice(reversed(asset.history[key].items()), counts[key])))) for key in asset.history}
+
+        # Only write the open positions that were entered or changed, along with the entry datetimes of the positions that were left
+        if full:
+            positions, left = asset.positions, dict()
+        else:
+            positions = {key : {entry_datetime : asset.positions[key][entry_datetime] for entry_datetime, mark in marks[key].items() if written[4][key].get(entry_datetime) != mark} for key in marks}
+            left = {key : [entry_datetime for entry_datetime in written[4][key] if not(entry_datetime in marks[key])] for key in marks}
+
+        # Remember what has now been written
+        self.__assets[symbol] = (asset, asset.revision, {key : len(asset.history[key]) for key in asset.history}, asset.merges, marks)
+
+        return {
+            'full' : full,
+            'positions' : positions,
+            'left' : left,
+            'history' : history,
+            'exposure' : asset.exposure,
+            'returns' : asset.returns,
+            'revision' : asset.revision,
+            'merges' : asset.merges,
+            'opmul' : asset.get_opmul()
+        }
+
+    def __build_record(self, portfolio, market_objects):
+
+        record = dict()
+
+        # Account level state
+        state = portfolio.get_state()
+        if state != self.__state:
+            record['portfolio'] = state
+            self.__state = state
+
+        # Symbol level state
+        assets = dict()
+        for symbol, asset in portfolio.positions.items():
+            asset_record = self.__asset_record(symbol, asset)
+            if asset_record != None: assets[symbol] = asset_record
+
+        if assets: record['assets'] = assets
+
+        # Symbols that were removed from the portfolio
+        removed = [symbol for symbol in self.__assets if not(symbol in portfolio.positions)]
+        for symbol in removed: self.__assets.pop(symbol)
+
+        if removed: record['removed'] = removed
+
+        # Cursor positions
+        cursors = dict()
+        for market_object in market_objects:
+            symbol = market_object.get_symbol()
+            if self.__cursors.get(symbol) != market_object.cursor:
+                cursors[symbol] = market_object.cursor
+                self.__cursors[symbol] = market_object.cursor
+
+        if cursors: record['cursors'] = cursors
+
+        return record
+
+    def __apply_record(self, portfolio, record):
+
+        # Restore the account level state
+        if 'portfolio' in record: self.__state = record['portfolio']
+
+        # Restore the state of each symbol
+        for symbol, asset_record in record.get('assets', dict()).items():
+
+            # Create a new asset for a full record, otherwise update the existing one
+            if asset_record['full']: portfolio.positions[symbol] = StockAsset()
+            asset = portfolio.positions[symbol]
+
+            # Update the open positions that changed, and remove those that were left
+            for key, positions in asset_record['positions'].items():
+                asset.positions[key].update(positions)
+
+            for key, entry_datetimes in asset_record.get('left', dict()).items():
+                for entry_datetime in entry_datetimes: asset.positions[key].pop(entry_datetime, None)
+
+            # Merged history entries are moved to the end, in the same way as when they were merged
+            for key, items in asset_record['history'].items():
+                for exit_datetime, item in items:
+                    asset.history[key].pop(exit_datetime, None)
+                    asset.history[key][exit_datetime] = item
+
+            # Setting the options multiplier recalculates the statistics, so it is restored before them
+            asset.set_opmul(asset_record['opmul'])
+            asset.exposure = asset_record['exposure']
+            asset.returns = asset_record['returns']
+            asset.revision = asset_record['revision']
+            asset.merges = asset_record.get('merges', 0)
+
+            self.__assets[symbol] = (asset, asset.revision, {key : len(asset.history[key]) for key in asset.history}, asset.merges, self.__marks(asset))
+
+        # Remove any symbols that are no longer in the portfolio
+        for symbol in record.get('removed', []):
+            portfolio.remove_symbol(symbol)
+            self.__assets.pop(symbol, None)
+
+        # Restore the cursors
+        self.__cursors.update(record.get('cursors', dict()))
+
+    def __write(self, path, record, mode):
+
+        # Write the record and make sure it reaches the disk, so that the checkpoint survives the worker dying. Returns the size of the record.
+        with open(path, mode) as f:
+            start = f.tell()
+
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+            return f.tell() - start
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def save(self, portfolio, *market_objects, full=False):
+        '''
+        Save the state of a backtest. Takes 3 arguments:
+
+        - portfolio : The instance of the Portfolio class being tested;
+        - market_objects : Any number of MarketObject instances, whose cursors will be saved;
+        - full (optional) : Set to True to rewrite the checkpoint as a single full snapshot, which keeps the file compact. Set to False by default.
+        '''
+
+        # Validation
+        type_check(Portfolio, portfolio)
+
+        # The first save for this instance is always a full snapshot, as is any save once the appended records outgrow the snapshot
+        if full or self.__state == None or self.__appended_size > self.__snapshot_size:
+            self.__reset()
+            record = self.__build_record(portfolio, market_objects)
+
+            # Write to a temporary file first so that an existing checkpoint is never left half written
+            self.__snapshot_size = self.__write(self.path + '.tmp', record, 'wb')
+            os.replace(self.path + '.tmp', self.path)
+
+        else:
+            record = self.__build_record(portfolio, market_objects)
+
+            # Only append to the file if anything has actually changed
+            if record: self.__appended_size += self.__write(self.path, record, 'ab')
+
+    def resume(self, portfolio, *market_objects):
+        '''
+        Restore the state of a backtest from the checkpoint file, so that it continues from where the last save was made. Returns True if a checkpoint was restored, and False if there was no checkpoint to restore. Takes 2 arguments:
+
+        - portfolio : The instance of the Portfolio class being tested. Any existing positions will be replaced;
+        - market_objects : Any number of MarketObject instances, whose cursors will be moved to the saved positions.
+        '''
+
+        # Validation
+        type_check(Portfolio, portfolio)
+
+        if not(os.path.exists(self.path)): return False
+
+        self.__reset()
+        portfolio.positions.clear()
+
+        # Read each record in order. A record that was only partly written when the worker died is discarded.
+        with open(self.path, 'rb') as f:
+            offset = 0
+
+            while True:
+                try:
+                    record = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+                    break
+
+                self.__apply_record(portfolio, record)
+
+                # Measure the snapshot and the records appended after it, so that the file is compacted at the same point
+                if offset == 0: self.__snapshot_size = f.tell()
+                else: self.__appended_size += f.tell() - offset
+
+                offset = f.tell()
+
+        # Remove any partly written record so that later saves append cleanly
+        if offset != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f: f.truncate(offset)
+
+        # A checkpoint without any complete records is treated as no checkpoint at all
+        if self.__state == None: return False
+
+        # Restore the portfolio, which recalculates its statistics from the restored positions
+        portfolio.set_state(self.__state)
+
+        # Move each of the market objects to their saved positions
+        for market_object in market_objects:
+            symbol = market_object.get_symbol()
+            if symbol in self.__cursors: market_object.seek(self.__cursors[symbol])
+
+        return True
+
+    def clear(self):
+        '''
+        Delete the checkpoint file, for example once a backtest has finished.
+        '''
+        if os.path.exists(self.path): os.remove(self.path)
+        self.__reset()
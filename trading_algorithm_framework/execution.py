@@ -0,0 +1,117 @@
+# The file for simulating how orders are filled by the market
+import numpy as np
+
+from trading_algorithm_framework.validation import *
+
+#----------------
+# Functions
+#----------------
+
+def _cumsum_by_bar(values, bars):
+
+    # Returns the running total of the values within each bar, in the order that they are given
+    bars = np.asarray(bars)
+    order = np.argsort(bars, kind='stable')
+
+    ordered = values[order]
+    total = np.cumsum(ordered)
+
+    # Find the first order of each bar, and take away the total before it
+    first = np.concatenate([[True], bars[order][1:] != bars[order][:-1]]) if len(bars) else np.empty(0, dtype=bool)
+    start = np.maximum.accumulate(np.where(first, np.arange(len(bars)), 0))
+
+    result = np.empty(total.shape, dtype=total.dtype)
+    result[order] = total - total[start] + ordered[start]
+
+    return result
+
+#----------------
+# Execution Models
+#----------------
+
+class ExecutionModel:
+    '''
+    Describes how orders are filled, including commission, slippage, and the volume that can be filled from each bar. Pass an instance of
+    this class to a Portfolio to use it for every buy and sell. Custom models can inherit from this class and override the 'fill' method.
+
+    Takes 5 arguments:
+
+    - commission (optional) : A fixed commission charged on every filled order. Set to 0 by default;
+    - commission_bps (optional) : A commission charged in basis points of the filled value. Set to 0 by default;
+    - spread_bps (optional) : The bid-ask spread in basis points. Half of the spread is paid on every fill. Set to 0 by default;
+    - impact_bps (optional) : The slippage in basis points for an order that takes the entire volume of the bar. Slippage grows linearly with the share of the bar volume that is filled. Set to 0 by default;
+    - participation (optional) : The largest share of the volume of each bar that can be filled, between 0 and 1, across every order filled from that bar. Any volume over the cap is not filled. Set to None by default, which fills every order in full.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, commission=0, commission_bps=0, spread_bps=0, impact_bps=0, participation=None):
+
+        # Validation
+        gte_zero(commission, commission_bps, spread_bps, impact_bps)
+
+        if participation != None:
+            gt_zero(participation)
+            if participation > 1: raise ValueError(f'Participation {participation} must not be greater than one!') from None
+
+        # Store each argument
+        self.commission = commission
+        self.commission_bps = commission_bps
+        self.spread_bps = spread_bps
+        self.impact_bps = impact_bps
+        self.participation = participation
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def fill(self, price, volume, bar_volume, side, filled=0, limit=None, bars=None):
+        '''
+        Fill a batch of orders. Each argument may be a single number, or a numpy array with one value per order, and the results take the same shape.
+
+        Returns a tuple of the fill prices, the filled volumes, and the commissions. Takes 7 arguments:
+
+        - price : The price of the bar that each order is filled against;
+        - volume : The volume of each order;
+        - bar_volume : The volume traded during the bar, taken from 'Point.volume';
+        - side : 1 for orders that buy, and -1 for orders that sell;
+        - filled (optional) : The volume already filled from the same bar by earlier orders, which counts towards the participation cap and the impact. Set to 0 by default;
+        - limit (optional) : The worst price that each order can be filled at, such as the limit of a resting limit order. Set to None by default, which has no limit;
+        - bars (optional) : An array with a label for the bar that each order is filled from, such as an integer for each symbol and datetime. Orders with the same label are filled in the order given, and the volume filled by the earlier ones counts towards the participation cap and the impact of the later ones. Set to None by default, which treats each order as the only one in the batch from its bar, so the caller must then add the volume of any earlier orders from the same bar to 'filled'.
+        '''
+
+        # Find the volume asked for by the earlier orders in the batch from the same bar
+        before = 0
+        if bars is not None:
+            volume = np.asarray(volume)
+            before = _cumsum_by_bar(volume, bars) - volume
+
+        # Cap the volume of each order at what is left of the participation rate, once the earlier orders from the bar have been filled
+        if self.participation != None:
+            available = np.maximum(np.floor(np.multiply(bar_volume, self.participation)) - filled, 0)
+            before = np.minimum(before, available)
+            volume = np.maximum(np.minimum(volume, available - before), 0)
+
+        # Slippage is half of the spread, plus the impact from the share of the bar volume that has been filled
+        slippage_bps = self.spread_bps / 2
+
+        if self.impact_bps:
+            slippage_bps = slippage_bps + self.impact_bps * np.divide(np.add(np.add(filled, before), volume), np.maximum(bar_volume, 1))
+
+        # Buy orders are filled above the price and sell orders are filled below it
+        fill_price = np.multiply(price, 1 + np.multiply(side, slippage_bps) / 10000)
+
+        # Limit orders are never filled at a worse price than their limit
+        if limit is not None:
+            fill_price = np.where(np.greater(side, 0), np.minimum(fill_price, limit), np.maximum(fill_price, limit))
+
+        # Commission is only charged on orders that were filled
+        commission = np.where(
+            np.greater(volume, 0),
+            self.commission + np.multiply(fill_price, volume) * self.commission_bps / 10000,
+            0
+        )
+
+        return fill_price, volume, commission
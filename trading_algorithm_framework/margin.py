@@ -0,0 +1,262 @@
+# The file for checking buying power, margin, and exposure limits on every fill
+from trading_algorithm_framework.validation import *
+
+#----------------
+# Margin Engine
+#----------------
+
+class MarginEngine:
+    '''
+    Create a new margin engine to check every order that a Portfolio enters against its buying power and exposure limits. Pass an
+    instance of this class to a Portfolio to use it. The engine keeps running totals that are updated on every fill and every price
+    mark, so that each check takes the same time no matter how many positions are open.
+
+    The equity of the account is the portfolio balance, plus the cost of the open long positions and calls (which the balance has already
+    paid for), plus the unrealised profit of every open position at the last marked price. The proceeds of short sales are not counted
+    as equity. Each open position requires a share of its value to be covered by the equity as margin, and an order is only accepted if
+    the equity left over covers the margin for the new position. A short margin of 0.5 is therefore the usual 150% initial margin on a
+    short sale, where the proceeds cover the first 100% and the account's own equity the other 50%.
+
+    Takes 6 arguments:
+
+    - long_margin (optional) : The share of the value of a long position held as margin. Set to 1 by default, which is a cash account;
+    - short_margin (optional) : The share of the value of a short position that the account's own equity must cover, not counting the proceeds of the sale. Set to 0.5 by default;
+    - option_margin (optional) : The share of the value of an option held as margin, where the value includes the options multiplier. Set to 1 by default;
+    - maintenance (optional) : The share of the margin that must be covered by the equity once a position has been entered. A margin call happens when the equity falls below this. Set to 0.5 by default;
+    - max_symbol_exposure (optional) : The largest value that may be held in any one symbol, as a multiple of the equity. Set to None by default, which has no limit;
+    - max_gross_exposure (optional) : The largest value that may be held across every symbol, as a multiple of the equity. Set to None by default, which has no limit.
+    '''
+
+    # Declare which asset types add to the long and short sides
+    __long_types = ['long', 'call']
+    __short_types = ['short', 'put']
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, long_margin=1, short_margin=0.5, option_margin=1, maintenance=0.5, max_symbol_exposure=None, max_gross_exposure=None):
+
+        # Validation
+        gt_zero(long_margin, short_margin, option_margin, maintenance)
+
+        if max_symbol_exposure != None: gt_zero(max_symbol_exposure)
+        if max_gross_exposure != None: gt_zero(max_gross_exposure)
+
+        # Store the share of the value held as margin for each asset type
+        self.rates = {
+            'long' : long_margin,
+            'short' : short_margin,
+            'call' : option_margin,
+            'put' : option_margin
+        }
+
+        # Store the limits
+        self.maintenance = maintenance
+        self.max_symbol_exposure = max_symbol_exposure
+        self.max_gross_exposure = max_gross_exposure
+
+        # Count the number of orders that were rejected
+        self.rejected = 0
+
+        self.reset()
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __totals(self, symbol, sign):
+
+        # Add (or with a sign of -1, remove) the contribution of a symbol to the running totals
+        units = self.__units[symbol]
+        basis = self.__basis[symbol]
+        price = self.__marks[symbol]
+
+        value = 0
+        requirement = 0
+        unrealised = 0
+
+        for asset_type in units:
+            value += units[asset_type] * price
+            requirement += units[asset_type] * price * self.rates[asset_type]
+
+            if asset_type in self.__long_types: unrealised += units[asset_type] * price - basis[asset_type]
+            else: unrealised += basis[asset_type] - units[asset_type] * price
+
+        self.__symbol_exposure[symbol] = value
+        self.__symbol_requirement[symbol] = requirement
+        self.__gross += sign * value
+        self.__requirement += sign * requirement
+        self.__unrealised += sign * unrealised
+
+    #----------------
+    # Getters & Setters
+    #----------------
+
+    def get_equity(self, portfolio):
+        return portfolio.balance + self.__long_basis + self.__unrealised
+
+    def get_requirement(self):
+        return self.__requirement
+
+    def get_buying_power(self, portfolio):
+        return self.get_equity(portfolio) - self.__requirement
+
+    def get_gross_exposure(self):
+        return self.__gross
+
+    def get_symbol_exposure(self, symbol):
+        return self.__symbol_exposure.get(symbol, 0)
+
+    def get_symbol_requirement(self, symbol):
+        return self.__symbol_requirement.get(symbol, 0)
+
+    def get_marks(self):
+        return dict(self.__marks)
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def reset(self):
+        '''
+        Clear all of the running totals.
+        '''
+
+        # For each symbol, the number of units held and their total cost for each asset type, and the last marked price
+        self.__units = dict()
+        self.__basis = dict()
+        self.__marks = dict()
+
+        # The value held in each symbol, and the margin that it requires
+        self.__symbol_exposure = dict()
+        self.__symbol_requirement = dict()
+
+        # The running totals across every symbol
+        self.__long_basis = 0
+        self.__gross = 0
+        self.__requirement = 0
+        self.__unrealised = 0
+
+    def rebuild(self, portfolio, marks=None):
+        '''
+        Rebuild the running totals from the open positions in a portfolio, for example after it has been restored from a checkpoint. Takes 2 arguments:
+
+        - portfolio : The instance of the Portfolio class;
+        - marks (optional) : A dictionary of the last marked price for each symbol, as returned by 'get_marks'. Symbols without a mark are marked at their entry price. Set to None by default.
+        '''
+        self.reset()
+
+        for symbol, asset in portfolio.positions.items():
+            for asset_type in self.rates:
+                multiplier = asset.get_opmul() if asset_type in ['call', 'put'] else 1
+
+                for share in asset.positions[asset_type].values():
+                    self.on_fill(symbol, asset_type, share.price, share.volume, share.price, multiplier)
+
+        # Restore the marked prices
+        if marks:
+            for symbol, price in marks.items():
+                if symbol in self.__units: self.mark(symbol, price)
+
+    def check(self, portfolio, symbol, asset_type, price, volume, multiplier=1, commission=0):
+        '''
+        Check whether a new position can be entered. Returns True if the order is accepted, and False if it is rejected. Takes 7 arguments:
+
+        - portfolio : The instance of the Portfolio class entering the position;
+        - symbol : The symbol of the market object;
+        - asset_type : One of 'long', 'short', 'call' or 'put';
+        - price : The price that the position will be entered at;
+        - volume : The volume of the order;
+        - multiplier (optional) : The options multiplier, for calls and puts. Set to 1 by default;
+        - commission (optional) : The commission paid on the order, which comes out of the equity. Set to 0 by default.
+        '''
+        value = price * volume * multiplier
+        equity = self.get_equity(portfolio) - commission
+
+        # Check that there is enough buying power to cover the margin on the new position, once the commission has been paid
+        accepted = equity - self.__requirement >= value * self.rates[asset_type]
+
+        # Check the exposure limits
+        if accepted and self.max_symbol_exposure != None:
+            accepted = self.get_symbol_exposure(symbol) + value <= self.max_symbol_exposure * equity
+
+        if accepted and self.max_gross_exposure != None:
+            accepted = self.__gross + value <= self.max_gross_exposure * equity
+
+        if not(accepted): self.rejected += 1
+
+        return accepted
+
+    def on_fill(self, symbol, asset_type, entry_price, volume, price, multiplier=1):
+        '''
+        Update the running totals after a fill. Takes 6 arguments:
+
+        - symbol : The symbol of the market object;
+        - asset_type : One of 'long', 'short', 'call' or 'put';
+        - entry_price : The price that the position was entered at;
+        - volume : The volume of the fill. This is positive when entering a position, and negative when leaving one;
+        - price : The price of the fill, which becomes the marked price for the symbol;
+        - multiplier (optional) : The options multiplier, for calls and puts. Set to 1 by default.
+        '''
+
+        # Add the symbol if it is new
+        if not(symbol in self.__units):
+            self.__units[symbol] = {asset_type : 0 for asset_type in self.rates}
+            self.__basis[symbol] = {asset_type : 0 for asset_type in self.rates}
+            self.__marks[symbol] = price
+
+        # Remove the old contribution of the symbol, update it, and then add it back
+        self.__totals(symbol, -1)
+
+        self.__units[symbol][asset_type] += volume * multiplier
+        self.__basis[symbol][asset_type] += entry_price * volume * multiplier
+        self.__marks[symbol] = price
+
+        if asset_type in self.__long_types: self.__long_basis += entry_price * volume * multiplier
+
+        self.__totals(symbol, 1)
+
+    def mark(self, symbol, price):
+        '''
+        Update the price that a symbol is valued at, for example on each new bar. Takes 2 arguments:
+
+        - symbol : The symbol of the market object;
+        - price : The new price.
+        '''
+        if not(symbol in self.__units): return
+
+        self.__totals(symbol, -1)
+        self.__marks[symbol] = price
+        self.__totals(symbol, 1)
+
+    def in_margin_call(self, portfolio):
+        '''
+        Returns True if the equity of the portfolio has fallen below the maintenance margin.
+        '''
+        return self.get_equity(portfolio) < self.maintenance * self.__requirement
+
+    def liquidate(self, portfolio, market_objects, exit_datetime):
+        '''
+        Force the portfolio to leave positions until it is no longer in a margin call. The symbols that require the most margin are sold first. Takes 3 arguments:
+
+        - portfolio : The instance of the Portfolio class;
+        - market_objects : A list of the MarketObject instances for the symbols that the portfolio holds;
+        - exit_datetime : The datetime object associated with the time the positions are left.
+        '''
+        market_objects = {market_object.get_symbol() : market_object for market_object in market_objects}
+
+        # Order the symbols by the margin that they require
+        symbols = sorted(self.__symbol_requirement, key=lambda symbol: self.__symbol_requirement[symbol], reverse=True)
+
+        for symbol in symbols:
+            if not(self.in_margin_call(portfolio)): return
+            if not(symbol in market_objects): continue
+
+            for asset_type in self.rates:
+                for entry_datetime in list(portfolio.positions[symbol].positions[asset_type].keys()):
+                    if not(self.in_margin_call(portfolio)): return
+
+                    # Sell the whole position
+                    volume = portfolio.positions[symbol].positions[asset_type][entry_datetime].volume
+                    portfolio.sell(market_objects[symbol], asset_type, entry_datetime, exit_datetime, volume)
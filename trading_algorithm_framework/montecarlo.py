@@ -0,0 +1,318 @@
+# The file for testing the robustness of a strategy by resampling its returns and trades
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from trading_algorithm_framework.validation import *
+
+#----------------
+# Quantile Sketch
+#----------------
+
+class QuantileSketch:
+    '''
+    Holds a summary of a stream of values that can be used to estimate their quantiles, without keeping every value in memory. Values
+    are kept as weighted centroids, and whenever there are more centroids than the size of the sketch, neighbouring centroids are merged
+    so that each holds an equal share of the values. Sketches can be merged with each other, so that they can be built in parallel.
+
+    Takes 1 argument:
+
+    - size (optional) : The largest number of centroids kept. Larger sketches are more accurate. Set to 1000 by default.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, size=1000):
+
+        # Validation
+        type_check(int, size)
+        gt_zero(size)
+
+        self.size = size
+
+        # The centroids, their weights, and the smallest and largest values seen
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def update(self, values, weights=None):
+        '''
+        Add values to the sketch. Takes 2 arguments:
+
+        - values : A numpy array of values;
+        - weights (optional) : A numpy array holding the weight of each value. Set to None by default, which gives each value a weight of one.
+        '''
+        values = np.asarray(values, dtype=float).ravel()
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+
+        if len(values) == 0: return
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        # Combine the new values with the existing centroids in order
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, weights])
+
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        # Merge neighbouring centroids into groups of equal weight
+        if len(means) > self.size:
+            cumulative = np.cumsum(weights)
+            groups = np.minimum(((cumulative - weights / 2) / cumulative[-1] * self.size).astype(int), self.size - 1)
+
+            weights_ = np.bincount(groups, weights, self.size)
+            means_ = np.bincount(groups, weights * means, self.size)
+
+            keep = weights_ > 0
+            means, weights = means_[keep] / weights_[keep], weights_[keep]
+
+        self.means, self.weights = means, weights
+
+    def merge(self, other):
+        '''
+        Add every value from another sketch to this one. Takes 1 argument:
+
+        - other : Another instance of the QuantileSketch class.
+        '''
+        self.update(other.means, other.weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def count(self):
+        return self.weights.sum()
+
+    def mean(self):
+        return (self.means * self.weights).sum() / self.weights.sum()
+
+    def quantile(self, q):
+        '''
+        Estimate one or more quantiles of the values. Takes 1 argument:
+
+        - q : A quantile between 0 and 1, or a list of them.
+        '''
+        cumulative = np.cumsum(self.weights) - self.weights / 2
+
+        # Include the smallest and largest values so that the tails are not cut short
+        positions = np.concatenate([[0], cumulative, [self.weights.sum()]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+
+        return np.interp(np.asarray(q) * self.weights.sum(), positions, values)
+
+#----------------
+# Functions
+#----------------
+
+def get_trades(portfolio):
+    '''
+    Returns a numpy array of the profit from every closed trade in a portfolio, in the order that the trades were closed. Takes 1 argument:
+
+    - portfolio : An instance of the Portfolio class.
+    '''
+    trades = []
+
+    for asset in portfolio.positions.values():
+        for asset_type, records in asset.history.items():
+            multiplier = asset.get_opmul() if asset_type in ['call', 'put'] else 1
+            sign = 1 if asset_type in ['long', 'call'] else -1
+
+            for exit_datetime, record in records.items():
+                trades.append((exit_datetime, sign * (record.exit_price - record.entry_price) * record.volume * multiplier))
+
+    trades.sort(key=lambda trade: trade[0])
+
+    return np.array([trade[1] for trade in trades])
+
+def get_metrics(equity, periods=252):
+    '''
+    Returns a dictionary holding the maximum drawdown, the annualised Sharpe ratio, and the final balance of each equity curve. Takes 2 arguments:
+
+    - equity : A numpy array of equity curves, with one curve on each row;
+    - periods (optional) : The number of bars in a year, used to annualise the Sharpe ratio. Set to 252 by default.
+    '''
+    returns = np.diff(equity, axis=1) / equity[:, :-1]
+
+    # A flat curve has no volatility, so its Sharpe ratio is set to zero
+    std = returns.std(axis=1)
+    sharpe = np.divide(returns.mean(axis=1), std, out=np.zeros(len(std)), where=std > 0) * np.sqrt(periods)
+
+    return {
+        'drawdown' : (1 - equity / np.maximum.accumulate(equity, axis=1)).max(axis=1),
+        'sharpe' : sharpe,
+        'balance' : equity[:, -1]
+    }
+
+def _block_indices(rng, paths, length, block):
+
+    # Choose the start of each block, and join the blocks together until each path is long enough
+    block = min(block, length)
+    starts = rng.integers(0, length - block + 1, (paths, -(-length // block)))
+
+    return (starts[:, :, None] + np.arange(block)).reshape(paths, -1)[:, :length]
+
+def _run_batch(kind, data, paths, seed, params):
+
+    # Each batch has its own random number generator, so the results do not depend on the number of workers
+    rng = np.random.default_rng(seed)
+    balance = params['balance']
+
+    # Block bootstrap of the returns
+    if kind == 'bootstrap':
+        indices = _block_indices(rng, paths, len(data), params['block'])
+
+        equity = balance * np.cumprod(np.concatenate([np.ones((paths, 1)), 1 + data[indices]], axis=1), axis=1)
+
+    # Shuffle the order of the trades, or resample them with replacement
+    elif kind == 'shuffle':
+        if params['replace']: trades = data[rng.integers(0, len(data), (paths, len(data)))]
+        else: trades = rng.permuted(np.tile(data, (paths, 1)), axis=1)
+
+        equity = balance + np.cumsum(np.concatenate([np.zeros((paths, 1)), trades], axis=1), axis=1)
+
+    # Build synthetic price paths from block bootstrapped log returns, and run the strategy over them
+    elif kind == 'synthetic':
+        prices, log_returns = data
+        indices = _block_indices(rng, paths, len(log_returns), params['block'])
+
+        prices = prices[0] * np.exp(np.concatenate([np.zeros((paths, 1)), np.cumsum(log_returns[indices], axis=1)], axis=1))
+
+        # Without a strategy, the price path is held
+        if params['strategy'] == None: equity = balance * prices / prices[:, :1]
+        else:
+            positions = np.asarray(params['strategy'](prices), dtype=float)
+            equity = balance + np.cumsum(np.concatenate([np.zeros((paths, 1)), positions[:, :-1] * np.diff(prices, axis=1)], axis=1), axis=1)
+
+    # Summarise the metrics of the batch
+    sketches = dict()
+
+    for key, values in get_metrics(equity, params['periods']).items():
+        sketches[key] = QuantileSketch(params['size'])
+        sketches[key].update(values)
+
+    return sketches
+
+#----------------
+# Monte Carlo Class
+#----------------
+
+class MonteCarlo:
+    '''
+    Create a new Monte Carlo engine to test the robustness of a strategy. Paths are generated in batches, each batch is summarised by a
+    QuantileSketch for each metric, and the sketches are merged. Only one batch of paths is ever held in memory by each worker.
+
+    Takes 6 arguments:
+
+    - paths (optional) : The number of paths to generate. Set to 10 000 by default;
+    - batch_size (optional) : The number of paths generated at once. Set to 1000 by default;
+    - seed (optional) : The seed for the random number generator. Each batch gets its own generator spawned from the seed, so the results are the same no matter how many workers are used. Set to None by default;
+    - workers (optional) : The number of processes to spread the batches over. Set to 1 by default, which runs every batch in this process, and None uses every CPU;
+    - quantiles (optional) : The quantiles reported for each metric. Set to [0.05, 0.5, 0.95] by default;
+    - periods (optional) : The number of bars in a year, used to annualise the Sharpe ratio. Set to 252 by default.
+
+    The metrics reported are the maximum 'drawdown', the annualised 'sharpe' ratio, and the final 'balance'. The full sketches from the last run are kept in 'sketches'.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, paths=10000, batch_size=1000, seed=None, workers=1, quantiles=[0.05, 0.5, 0.95], periods=252):
+
+        # Validation
+        type_check(int, paths, batch_size)
+        gt_zero(paths, batch_size, periods)
+
+        if workers != None: gt_zero(workers)
+
+        self.paths = paths
+        self.batch_size = batch_size
+        self.seed = seed
+        self.workers = workers if workers != None else os.cpu_count()
+        self.quantiles = quantiles
+        self.periods = periods
+
+        self.sketches = dict()
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __run(self, kind, data, **params):
+
+        params['periods'] = self.periods
+        params['size'] = 1000
+
+        # Split the paths into batches, each with its own seed
+        sizes = [min(self.batch_size, self.paths - start) for start in range(0, self.paths, self.batch_size)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+
+        arguments = [(kind, data, size, seed, params) for size, seed in zip(sizes, seeds)]
+
+        # Run the batches, in other processes if there is more than one worker
+        if self.workers == 1:
+            results = (_run_batch(*args) for args in arguments)
+        else:
+            with ProcessPoolExecutor(self.workers) as executor:
+                results = list(executor.map(_run_batch, *zip(*arguments)))
+
+        # Merge the sketches from every batch
+        self.sketches = dict()
+
+        for sketches in results:
+            for key, sketch in sketches.items():
+                if key in self.sketches: self.sketches[key].merge(sketch)
+                else: self.sketches[key] = sketch
+
+        return {key : {q : float(value) for q, value in zip(self.quantiles, sketch.quantile(self.quantiles))} for key, sketch in self.sketches.items()}
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def bootstrap(self, returns, block=20, balance=50000):
+        '''
+        Resample a series of returns in blocks, which keeps some of the dependence between neighbouring returns. Returns a dictionary holding the quantiles of each metric. Takes 3 arguments:
+
+        - returns : A numpy array of the return of the strategy at each bar, as a fraction;
+        - block (optional) : The number of bars in each block. Set to 20 by default;
+        - balance (optional) : The balance that each path begins with. Set to 50 000 by default.
+        '''
+        gt_zero(block, balance)
+
+        return self.__run('bootstrap', np.asarray(returns, dtype=float), block=block, balance=balance)
+
+    def shuffle(self, trades, replace=False, balance=50000):
+        '''
+        Shuffle the order of a sequence of trades, which changes the drawdown but not the final balance. Returns a dictionary holding the quantiles of each metric. Takes 3 arguments:
+
+        - trades : A numpy array of the profit from each trade, such as the one returned by 'get_trades';
+        - replace (optional) : Set to True to resample the trades with replacement instead, which also changes the final balance. Set to False by default;
+        - balance (optional) : The balance that each path begins with. Set to 50 000 by default.
+        '''
+        gt_zero(balance)
+
+        return self.__run('shuffle', np.asarray(trades, dtype=float), replace=replace, balance=balance)
+
+    def synthetic(self, market_object, strategy=None, block=20, balance=50000):
+        '''
+        Build synthetic price paths by resampling the returns of a market object in blocks, and run a strategy over each of them. Returns a dictionary holding the quantiles of each metric. Takes 4 arguments:
+
+        - market_object : The instance of the MarketObject class whose returns are resampled;
+        - strategy (optional) : A function that takes a numpy array of price paths, with one path on each row, and returns the position held at each bar in the same shape. When there is more than one worker, this must be defined at the top level of a module so that it can be sent to the other processes. Set to None by default, which holds the price path;
+        - block (optional) : The number of bars in each block. Set to 20 by default;
+        - balance (optional) : The balance that each path begins with. Set to 50 000 by default.
+        '''
+        gt_zero(block, balance)
+
+        prices = market_object.history_df['close'].to_numpy(dtype=float)
+
+        return self.__run('synthetic', (prices, np.diff(np.log(prices))), strategy=strategy, block=block, balance=balance)
@@ -0,0 +1,327 @@
+# The file for building portfolio weights and rebalancing a Portfolio towards them
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from trading_algorithm_framework.validation import *
+from trading_algorithm_framework.portfolio import *
+
+#----------------
+# Functions
+#----------------
+
+def get_returns_panel(market_objects):
+    '''
+    Returns a dataframe of the close to close returns of each market object, with one column for each symbol and one row for each date. Returns are zero on dates that a symbol did not trade. Takes 1 argument:
+
+    - market_objects : A list of MarketObject instances.
+    '''
+    closes = pd.concat({market_object.get_symbol() : market_object.history_df['close'] for market_object in market_objects}, axis=1).sort_index()
+
+    return closes.ffill().pct_change().fillna(0)
+
+#----------------
+# Optimizer Class
+#----------------
+
+class Optimizer:
+    '''
+    Create a new optimizer to calculate target weights for a set of symbols on each rebalance date. The covariance of the returns is
+    estimated for a batch of rebalance dates at a time, and the weights for the whole batch are solved together with numpy.
+
+    Takes 9 arguments:
+
+    - method (optional) : How the weights are chosen. Takes 3 possible values:
+        - 'inverse_vol' : (default) Weights proportional to one over the volatility of each symbol;
+        - 'risk_parity' : Weights where each symbol adds the same amount of risk to the portfolio;
+        - 'mean_variance' : Weights that maximise the mean return minus half of the risk aversion times the variance.
+    - lookback (optional) : The number of bars of returns used on each rebalance date. Set to 252 by default;
+    - long_only (optional) : Set to False to allow negative weights with 'mean_variance'. Set to True by default;
+    - max_weight (optional) : The largest weight of any one symbol with 'mean_variance'. When negative weights are allowed, this also limits how negative a weight can be. It must be at least one over the number of symbols. Set to None by default, which has no limit;
+    - risk_aversion (optional) : The risk aversion used by 'mean_variance'. Set to 1 by default;
+    - shrinkage (optional) : How far the sample covariance is shrunk towards its diagonal, between 0 and 1. Shrinkage keeps the covariance well conditioned when there are more symbols than bars in the lookback. Set to 0.1 by default;
+    - max_iter (optional) : The largest number of iterations for the iterative solvers. 'risk_parity' warns if it is reached. Set to 500 by default;
+    - tol (optional) : The iterative solvers stop once no weight changes by more than this. Set to 1e-6 by default;
+    - batch_size (optional) : The number of rebalance dates solved together. Set to 12 by default.
+
+    Every weight sums to one. The iterative solvers are warm started from the weights of the previous batch of rebalance dates.
+    '''
+
+    # Declare a list of valid methods
+    __methods = ['inverse_vol', 'risk_parity', 'mean_variance']
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, method='inverse_vol', lookback=252, long_only=True, max_weight=None, risk_aversion=1, shrinkage=0.1, max_iter=500, tol=1e-6, batch_size=12):
+
+        # Validation
+        if not(method in self.__methods): raise ValueError(f'Method {method} is not recognised!') from None
+        type_check(int, lookback, max_iter, batch_size)
+        gt_zero(risk_aversion, max_iter, tol, batch_size)
+
+        if lookback < 2: raise ValueError(f'Lookback {lookback} must hold at least two bars!') from None
+        if max_weight != None: gt_zero(max_weight)
+        if shrinkage < 0 or shrinkage > 1: raise ValueError(f'Shrinkage {shrinkage} must be between zero and one!') from None
+
+        self.method = method
+        self.lookback = lookback
+        self.long_only = long_only
+        self.max_weight = max_weight
+        self.risk_aversion = risk_aversion
+        self.shrinkage = shrinkage
+        self.max_iter = max_iter
+        self.tol = tol
+        self.batch_size = batch_size
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __windows(self, returns, ends):
+
+        # Stack the window of returns for each rebalance date, with shape [dates, lookback, symbols]
+        windows = returns[ends[:, None] + np.arange(-self.lookback + 1, 1)]
+
+        # Scale the demeaned returns so that the sample covariance is factors' @ factors, and then shrink it towards its diagonal
+        mean = windows.mean(axis=1)
+        factors = (windows - mean[:, None, :]) * np.sqrt((1 - self.shrinkage) / (self.lookback - 1))
+
+        variance = (windows - mean[:, None, :]).var(axis=1, ddof=1)
+
+        # The diagonal of the covariance is then factors' @ factors plus the ridge, where a small extra ridge makes sure that every covariance can be inverted
+        ridge = self.shrinkage * variance + 1e-10 + 1e-8 * variance.mean(axis=1, keepdims=True)
+
+        return mean, factors, (factors ** 2).sum(axis=1) + ridge, ridge
+
+    def __multiply(self, factors, ridge, weights):
+
+        # Multiply the weights by the covariance, without building the covariance itself
+        return (factors.transpose(0, 2, 1) @ (factors @ weights[:, :, None]))[:, :, 0] + ridge * weights
+
+    def __project(self, v):
+
+        # Project each row onto the weights that sum to one and lie within the limits, by bisecting on a shift
+        upper = self.max_weight if self.max_weight != None else 1.0
+        lower = 0 if self.long_only else -upper
+
+        # Without a limit on the largest weight, the shift onto the simplex can be found exactly by sorting each row
+        if self.long_only and upper >= 1:
+            ordered = -np.sort(-v, axis=1)
+            shifts = (np.cumsum(ordered, axis=1) - 1) / np.arange(1, v.shape[1] + 1)
+            count = (ordered > shifts).sum(axis=1, keepdims=True)
+
+            return np.maximum(v - np.take_along_axis(shifts, count - 1, axis=1), 0)
+
+        low = (v.min(axis=1) - upper)[:, None]
+        high = (v.max(axis=1) - lower)[:, None]
+
+        for i in range(50):
+            shift = (low + high) / 2
+            over = np.clip(v - shift, lower, upper).sum(axis=1, keepdims=True) > 1
+            low = np.where(over, shift, low)
+            high = np.where(over, high, shift)
+
+        return np.clip(v - (low + high) / 2, lower, upper)
+
+    def __inverse_vol(self, variance):
+        weights = 1 / np.sqrt(variance + 1e-20)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def __solve(self, factors, diagonal, right):
+
+        # Solve (diagonal + factors' @ factors) @ x = right for each date. The Woodbury identity only needs a solve the size of the lookback,
+        # so this stays cheap when there are many more symbols than bars.
+        right = right / diagonal[:, :, None]
+        scaled = factors / diagonal[:, None, :]
+
+        inner = factors @ scaled.transpose(0, 2, 1) + np.eye(factors.shape[1])
+        return right - scaled.transpose(0, 2, 1) @ np.linalg.solve(inner, factors @ right)
+
+    def __risk_parity(self, factors, ridge, start):
+
+        # Minimise y' @ covariance @ y / 2 - sum(log(y)) / n over positive y. At the minimum y * (covariance @ y) = 1 / n, so each symbol
+        # adds the same amount of risk once y is scaled to sum to one. The objective is strictly convex, so Newton's method converges for
+        # any number of symbols, including when there are more symbols than bars in the lookback.
+        n = start.shape[1]
+
+        def objective(y):
+            return (y * self.__multiply(factors, ridge, y)).sum(axis=1) / 2 - np.log(y).sum(axis=1) / n
+
+        y = start / np.sqrt((start * self.__multiply(factors, ridge, start)).sum(axis=1, keepdims=True))
+        value = objective(y)
+
+        for i in range(self.max_iter):
+            gradient = self.__multiply(factors, ridge, y) - 1 / (n * y)
+
+            # The hessian is the covariance plus a diagonal, so the Newton step is found with the Woodbury identity
+            step = -self.__solve(factors, ridge + 1 / (n * y ** 2), gradient[:, :, None])[:, :, 0]
+            decrement = -(gradient * step).sum(axis=1)
+
+            # Close to the minimum a full step is always taken, as the objective times n is self concordant. Further away, y is kept
+            # positive and the step is halved until the objective falls by enough.
+            close = n * decrement < 0.1
+            size = np.where(close, 1, np.minimum(1, 0.99 * np.where(step < 0, -y / np.where(step < 0, step, -1), np.inf).min(axis=1)))
+
+            for j in range(50):
+                new_y = y + size[:, None] * step
+                new_value = objective(new_y)
+
+                enough = close | (new_value <= value - 1e-4 * size * decrement)
+                if enough.all(): break
+                size = np.where(enough, size, size / 2)
+
+            change = (size[:, None] * np.abs(step) / y).max()
+            y, value = new_y, new_value
+
+            # Once a full step changes no element of y by more than the tolerance, the next step would be far smaller still
+            if change < self.tol and close.all(): break
+
+        else: warnings.warn(f'Risk parity did not converge within {self.max_iter} iterations!', RuntimeWarning)
+
+        return y / y.sum(axis=1, keepdims=True)
+
+    def __mean_variance(self, mean, factors, ridge, start):
+
+        # Without any limits on the weights, the answer can be solved directly. The covariance is a diagonal plus factors' @ factors,
+        # so it is inverted with the Woodbury identity, which only needs a solve the size of the lookback.
+        if not(self.long_only) and self.max_weight == None:
+            solved = self.__solve(factors, ridge, np.stack([mean, np.ones(mean.shape)], axis=2))
+
+            weights = solved[:, :, 0] / self.risk_aversion
+            budget = (1 - weights.sum(axis=1, keepdims=True)) / solved[:, :, 1].sum(axis=1, keepdims=True)
+
+            return weights + budget * solved[:, :, 1]
+
+        # Otherwise use accelerated projected gradient descent, with a step size from the largest eigenvalue of each covariance
+        vector = np.ones(mean.shape)
+        for i in range(20):
+            vector = self.__multiply(factors, ridge, vector)
+            vector /= np.linalg.norm(vector, axis=1, keepdims=True)
+
+        step = 1 / (self.risk_aversion * (vector * self.__multiply(factors, ridge, vector)).sum(axis=1, keepdims=True))
+
+        weights = self.__project(start)
+        momentum = weights
+        t = 1
+
+        for i in range(self.max_iter):
+            gradient = self.risk_aversion * self.__multiply(factors, ridge, momentum) - mean
+            new_weights = self.__project(momentum - step * gradient)
+
+            # Restart the momentum whenever it points uphill
+            if (gradient * (new_weights - weights)).sum() > 0: t = 1
+
+            new_t = (1 + np.sqrt(1 + 4 * t ** 2)) / 2
+            momentum = new_weights + (t - 1) / new_t * (new_weights - weights)
+
+            change = np.abs(new_weights - weights).max()
+            weights, t = new_weights, new_t
+
+            if change < self.tol: break
+
+        return weights
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def solve(self, panel, dates=None, previous=None):
+        '''
+        Calculate the target weights on each rebalance date. Returns a dataframe with one row for each rebalance date and one column for each symbol. Takes 3 arguments:
+
+        - panel : A dataframe of returns, such as the one returned by 'get_returns_panel';
+        - dates (optional) : A list of the rebalance dates. Each date uses the returns up to and including that date, and dates without a full lookback of returns before them are left out. Set to None by default, which rebalances on the last date of each month;
+        - previous (optional) : The weights to warm start the first batch from, as a dictionary or pandas series. Set to None by default, which starts from equal weights.
+        '''
+
+        # Find the position of each rebalance date in the panel
+        if dates is None: dates = panel.index.to_series().groupby(panel.index.to_period('M')).max()
+
+        ends = panel.index.get_indexer(pd.DatetimeIndex(dates))
+        ends = ends[ends >= self.lookback - 1]
+
+        returns = panel.to_numpy(dtype=float)
+        n = returns.shape[1]
+
+        # Start from the previous weights if there are any
+        start = np.full(n, 1 / n)
+        if previous is not None: start = pd.Series(previous).reindex(panel.columns).fillna(0).to_numpy(dtype=float)
+
+        weights = np.empty((len(ends), n))
+
+        for first in range(0, len(ends), self.batch_size):
+            batch = ends[first:first + self.batch_size]
+            # Inverse volatility weights only need the variance of each symbol
+            if self.method == 'inverse_vol':
+                weights[first:first + len(batch)] = self.__inverse_vol(returns[batch[:, None] + np.arange(-self.lookback + 1, 1)].var(axis=1, ddof=1))
+                continue
+
+            mean, factors, variance, ridge = self.__windows(returns, batch)
+
+            # Every date in the batch is warm started from the last weights of the previous batch
+            batch_start = np.tile(start, (len(batch), 1))
+
+            if self.method == 'risk_parity': solved = self.__risk_parity(factors, ridge, np.where(batch_start > 0, batch_start, 1 / n))
+            else: solved = self.__mean_variance(mean, factors, ridge, batch_start)
+
+            weights[first:first + len(batch)] = solved
+            start = solved[-1]
+
+        return pd.DataFrame(weights, index=panel.index[ends], columns=panel.columns)
+
+    def get_orders(self, portfolio, market_objects, weights, date):
+        '''
+        Returns a dictionary of the change in volume needed in each symbol for a portfolio to reach its target weights. Positive changes buy and negative changes sell. Takes 4 arguments:
+
+        - portfolio : The instance of the Portfolio class being rebalanced;
+        - market_objects : A list of the MarketObject instances for each symbol;
+        - weights : The target weight of each symbol, as a dictionary or a row of the dataframe returned by 'solve'. Symbols that are held but not given a weight are sold;
+        - date : The datetime of the bar whose close prices are used, such as a date from the index returned by 'solve'.
+        '''
+        date = pd.Timestamp(date).to_pydatetime()
+        prices = {market_object.get_symbol() : market_object.history[date].close_price for market_object in market_objects if date in market_object.history}
+
+        # Find the net volume held in each symbol, and the value of the portfolio at the current prices
+        held = dict()
+        value = portfolio.balance
+
+        for symbol, asset in portfolio.positions.items():
+            long_volume = sum(share.volume for share in asset.positions['long'].values())
+            short_volume = sum(share.volume for share in asset.positions['short'].values())
+            held[symbol] = long_volume - short_volume
+
+            # The balance has already paid for the long positions, but has not been credited for the short positions
+            if symbol in prices:
+                value += long_volume * prices[symbol]
+                value += sum((share.price - prices[symbol]) * share.volume for share in asset.positions['short'].values())
+
+        # Every symbol that is held but not given a weight has a target of zero
+        targets = {symbol : 0 for symbol, volume in held.items() if volume != 0}
+        targets.update(dict(weights))
+
+        orders = dict()
+
+        for symbol, weight in targets.items():
+            if not(symbol in prices): continue
+
+            change = int(weight * value / prices[symbol]) - held.get(symbol, 0)
+            if change != 0: orders[symbol] = change
+
+        return orders
+
+    def rebalance(self, portfolio, market_objects, weights, date):
+        '''
+        Buy and sell so that a portfolio reaches its target weights, and return the orders that were made. Every sell is made before any buy, so that the sells pay for the buys. Each order is made with 'Portfolio.trade', so positions are left oldest first, and long positions are sold before any short positions are entered. Takes the same 4 arguments as 'get_orders'.
+        '''
+        date = pd.Timestamp(date).to_pydatetime()
+
+        market_objects = {market_object.get_symbol() : market_object for market_object in market_objects}
+        orders = self.get_orders(portfolio, market_objects.values(), weights, date)
+
+        for symbol, change in sorted(orders.items(), key=lambda order: order[1] > 0):
+            portfolio.trade(market_objects[symbol], change, date)
+
+        return orders
@@ -0,0 +1,368 @@
+# The file for holding resting orders and matching them against each new bar
+import heapq
+from datetime import datetime
+
+from trading_algorithm_framework.validation import *
+
+#----------------
+# Functions
+#----------------
+
+def _get_path(point):
+
+    # Bars without an open, low or high are treated as trading only at the close
+    open_price = point.open_price if point.open_price != None else point.close_price
+    low_price = point.low_price if point.low_price != None else min(open_price, point.close_price)
+    high_price = point.high_price if point.high_price != None else max(open_price, point.close_price)
+
+    # A bar that closes up is assumed to reach its low before its high, and a bar that closes down its high before its low
+    if point.close_price >= open_price: return [open_price, low_price, high_price, point.close_price]
+    return [open_price, high_price, low_price, point.close_price]
+
+def _first_cross(path, level, direction, start=0.0):
+
+    # Find the first time along the path, from 'start' onwards, that the price is at or below the level (direction -1) or at or above it (direction 1).
+    # Time is measured in legs, so the open is at 0 and the close is at 3. Returns the time and the price, or None if the level is never reached.
+    i = min(int(start), len(path) - 2)
+    price = path[i] + (path[i + 1] - path[i]) * (start - i)
+
+    # The price is already through the level, such as when the bar opens through it
+    if (price - level) * direction >= 0: return start, price
+
+    for i in range(i, len(path) - 1):
+        if (path[i + 1] - level) * direction >= 0:
+            return i + (level - path[i]) / (path[i + 1] - path[i]), level
+
+    return None
+
+#----------------
+# Order Class
+#----------------
+
+class Order:
+    '''
+    Describes a resting order held in an OrderBook. Orders are created with 'OrderBook.place' rather than directly.
+
+    Takes 8 arguments:
+
+    - symbol : The symbol of the market object being traded;
+    - side : 1 for an order that buys, and -1 for an order that sells;
+    - volume : The number of shares in the order;
+    - order_type : Either 'limit', 'stop' or 'stop_limit';
+    - limit_price : The worst price that a limit or stop limit order will be filled at;
+    - stop_price : The price that triggers a stop or stop limit order;
+    - expiry_datetime : The last datetime that the order can be filled on, or None for an order that is good until it is cancelled;
+    - sequence : The number of orders placed before this one, which gives earlier orders priority.
+
+    The 'status' of an order is either 'open', 'filled', 'cancelled' or 'expired', and each fill is stored in 'fills' as a tuple of the
+    datetime, the price that the order was matched at, and the volume.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, symbol, side, volume, order_type, limit_price, stop_price, expiry_datetime, sequence):
+
+        self.symbol = symbol
+        self.side = side
+        self.volume = volume
+        self.order_type = order_type
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.expiry_datetime = expiry_datetime
+        self.sequence = sequence
+
+        # Stop orders are filled at the next price available once they have been triggered, and stop limit orders rest as limit orders
+        self.triggered = False
+
+        self.filled = 0
+        self.status = 'open'
+        self.fills = []
+
+    #----------------
+    # Getters & Setters
+    #----------------
+
+    def get_remaining(self):
+        return self.volume - self.filled
+
+    def is_open(self):
+        return self.status == 'open'
+
+#----------------
+# Order Book Class
+#----------------
+
+class OrderBook:
+    '''
+    Create a new order book to hold limit, stop, and stop limit orders for a portfolio until they are filled, cancelled, or expire.
+
+    Each symbol has four heaps, holding the buy limits from the highest price, the sell limits from the lowest price, the buy stops from
+    the lowest price, and the sell stops from the highest price. When a new bar is matched, orders are only taken from the top of each
+    heap while they cross the range of the bar, so the cost of matching grows with the number of orders that are filled rather than the
+    number of orders that are resting. Cancelled and expired orders are left in the heaps and are skipped when they reach the top, and
+    each heap is rebuilt without them once they make up half of it.
+
+    Each bar is assumed to move from its open to its low, then its high, and then its close when it closes up, or from its open to its
+    high, then its low, and then its close when it closes down. Orders are filled at their limit or stop price at the point where the bar
+    reaches it, or at the open if the bar opens through it, and orders are filled in the order that the bar reaches them. Every fill is
+    made through 'Portfolio.trade', so the execution model and margin engine of the portfolio apply to it, although the costs of the
+    execution model never push a limit order past its limit price. Any volume that can not be filled stays in the book, and the rest of
+    a stop order that has been triggered is filled at the open of the following bars.
+
+    Takes 1 argument:
+
+    - portfolio : The instance of the Portfolio class that the orders are filled for.
+    '''
+
+    # Declare a list of valid order types
+    __order_types = ['limit', 'stop', 'stop_limit']
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, portfolio):
+
+        self.portfolio = portfolio
+
+        # Declare the heaps for each symbol, and a heap of the orders that have an expiry datetime
+        self.__books = dict()
+        self.__expiries = []
+
+        # Count the orders placed, so that each order has its own place in the queue
+        self.__sequence = 0
+
+        # Count the orders in each heap that are no longer open, so that the heap can be rebuilt without them once they make up half of it
+        self.__dead = dict()
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __get_book(self, symbol):
+        if not(symbol in self.__books): self.__books[symbol] = {'buy_limit' : [], 'sell_limit' : [], 'buy_stop' : [], 'sell_stop' : [], 'market' : []}
+        return self.__books[symbol]
+
+    def __get_key(self, order):
+
+        # Triggered stop orders that were not completely filled are filled at the open of the next bar
+        if order.order_type == 'stop' and order.triggered: return 'market'
+
+        # Limit orders, including triggered stop limit orders, are held by their limit price, and everything else by its stop price
+        if order.order_type == 'limit' or order.triggered: return 'buy_limit' if order.side == 1 else 'sell_limit'
+        return 'buy_stop' if order.side == 1 else 'sell_stop'
+
+    def __push(self, order):
+
+        book = self.__get_book(order.symbol)
+        key = self.__get_key(order)
+
+        # Prices are negated in the heaps that are taken from the highest price
+        if key == 'market': book['market'].append(order)
+        elif key == 'buy_limit': heapq.heappush(book['buy_limit'], (-order.limit_price, order.sequence, order))
+        elif key == 'sell_limit': heapq.heappush(book['sell_limit'], (order.limit_price, order.sequence, order))
+        elif key == 'buy_stop': heapq.heappush(book['buy_stop'], (order.stop_price, order.sequence, order))
+        else: heapq.heappush(book['sell_stop'], (-order.stop_price, order.sequence, order))
+
+    def __discard(self, symbol, key):
+
+        # Count an order in a heap that is no longer open. The heap of expiries is stored with a symbol and key of None.
+        if key == 'market': return
+        heap = self.__expiries if key == None else self.__books[symbol][key]
+
+        dead = self.__dead.get((symbol, key), 0) + 1
+
+        # Once half of the heap is made up of orders that are no longer open, rebuild it with only the open orders
+        if 2 * dead > len(heap):
+            heap[:] = [entry for entry in heap if entry[2].is_open()]
+            heapq.heapify(heap)
+            dead = 0
+
+        self.__dead[(symbol, key)] = dead
+
+    def __pop_crossing(self, symbol, key, bound):
+
+        # Take every open order from the top of the heap whose key is no greater than the bound
+        heap = self.__books[symbol][key]
+        orders = []
+
+        while heap and heap[0][0] <= bound:
+            order = heapq.heappop(heap)[2]
+
+            if order.is_open(): orders.append(order)
+            else: self.__dead[(symbol, key)] = max(self.__dead.get((symbol, key), 0) - 1, 0)
+
+        return orders
+
+    def __expire(self, date):
+
+        # Orders can be filled up to and including their expiry datetime
+        while self.__expiries and self.__expiries[0][0] < date:
+            order = heapq.heappop(self.__expiries)[2]
+
+            if order.is_open():
+                order.status = 'expired'
+                self.__discard(order.symbol, self.__get_key(order))
+
+            else: self.__dead[(None, None)] = max(self.__dead.get((None, None), 0) - 1, 0)
+
+    def __cross(self, path, order):
+
+        # Stop orders that have already been triggered fill at the open
+        if order.order_type == 'stop' and order.triggered: return 0.0, path[0]
+
+        # Limit orders fill once the price reaches the limit from the favourable side
+        if order.order_type == 'limit' or order.triggered: return _first_cross(path, order.limit_price, -order.side)
+
+        # Stop orders trigger once the price reaches the stop from the other side
+        trigger = _first_cross(path, order.stop_price, order.side)
+        if trigger == None: return None
+
+        order.triggered = True
+        if order.order_type == 'stop': return trigger
+
+        # A stop limit order then rests as a limit order for the rest of the bar
+        return _first_cross(path, order.limit_price, -order.side, trigger[0])
+
+    #----------------
+    # Getters & Setters
+    #----------------
+
+    def get_orders(self, symbol=None):
+        '''
+        Returns a list of the open orders, ordered by the time they were placed. Takes 1 argument:
+
+        - symbol (optional) : Only return the orders for this symbol. Set to None by default, which returns the orders for every symbol.
+        '''
+        symbols = [symbol] if symbol != None else list(self.__books)
+        orders = []
+
+        for symbol in symbols:
+            book = self.__books.get(symbol, dict())
+
+            for key, heap in book.items():
+                orders += [entry if key == 'market' else entry[2] for entry in heap]
+
+        return sorted([order for order in orders if order.is_open()], key=lambda order: order.sequence)
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def place(self, market_object, volume, order_type='limit', limit_price=None, stop_price=None, expiry_datetime=None):
+        '''
+        Place a new resting order, and return the instance of the Order class that describes it. Takes 6 arguments:
+
+        - market_object : The instance of the MarketObject class being traded;
+        - volume : The number of shares to buy, or a negative number to sell. Orders are filled with 'Portfolio.trade', so selling first leaves any long positions;
+        - order_type (optional) : The type of order. Takes 3 possible values:
+            - 'limit' : (default) Buy at or below the limit price, or sell at or above it;
+            - 'stop' : Buy once the price rises to the stop price, or sell once it falls to it, at the next price available;
+            - 'stop_limit' : Once the stop price is reached, rest as a limit order at the limit price.
+        - limit_price (optional) : The limit price, needed by 'limit' and 'stop_limit' orders. Set to None by default;
+        - stop_price (optional) : The stop price, needed by 'stop' and 'stop_limit' orders. Set to None by default;
+        - expiry_datetime (optional) : The datetime object of the last bar that the order can be filled on, which makes it good until that date. Set to None by default, which keeps the order until it is filled or cancelled.
+        '''
+
+        # Validation
+        type_check(int, volume)
+        if volume == 0: raise ValueError('Volume must not be zero!') from None
+
+        if not(order_type in self.__order_types): raise ValueError(f'Order type {order_type} is not recognised!') from None
+        if order_type != 'stop' and limit_price == None: raise ValueError(f'A {order_type} order needs a limit price!') from None
+        if order_type != 'limit' and stop_price == None: raise ValueError(f'A {order_type} order needs a stop price!') from None
+
+        if limit_price != None: gt_zero(limit_price)
+        if stop_price != None: gt_zero(stop_price)
+        if expiry_datetime != None: type_check(datetime, expiry_datetime)
+
+        order = Order(
+            market_object.get_symbol(),
+            1 if volume > 0 else -1,
+            abs(volume),
+            order_type,
+            float(limit_price) if limit_price != None else None,
+            float(stop_price) if stop_price != None else None,
+            expiry_datetime,
+            self.__sequence
+        )
+
+        self.__sequence += 1
+
+        self.__push(order)
+        if expiry_datetime != None: heapq.heappush(self.__expiries, (expiry_datetime, order.sequence, order))
+
+        return order
+
+    def cancel(self, order):
+        '''
+        Cancel an open order. Takes 1 argument:
+
+        - order : The instance of the Order class returned by 'place'.
+        '''
+        if not(order.is_open()): return
+
+        order.status = 'cancelled'
+
+        # The order is left in its heaps, and is only counted so that the heaps can be rebuilt once they are mostly cancelled orders
+        self.__discard(order.symbol, self.__get_key(order))
+        if order.expiry_datetime != None: self.__discard(None, None)
+
+    def match(self, market_object, date):
+        '''
+        Match the resting orders for a market object against one of its bars, and fill every order that the bar crosses. Returns a list of
+        the orders that were filled during the bar, including those that were only partly filled. Takes 2 arguments:
+
+        - market_object : The instance of the MarketObject class that the orders are for;
+        - date : The datetime object of the bar, such as the one returned by 'MarketObject.step'.
+        '''
+        self.__expire(date)
+
+        book = self.__books.get(market_object.get_symbol())
+        if book == None: return []
+
+        point = market_object.history[date]
+        path = _get_path(point)
+
+        low, high = min(path), max(path)
+
+        # Take the orders whose prices lie within the range of the bar
+        symbol = market_object.get_symbol()
+
+        orders = self.__pop_crossing(symbol, 'buy_limit', -low) + self.__pop_crossing(symbol, 'sell_limit', high)
+        orders += self.__pop_crossing(symbol, 'buy_stop', high) + self.__pop_crossing(symbol, 'sell_stop', -low)
+
+        orders += [order for order in book['market'] if order.is_open()]
+        book['market'] = []
+
+        # Find where each order is filled along the bar, and fill them in that order
+        fills = []
+
+        for order in orders:
+            cross = self.__cross(path, order)
+            if cross != None: fills.append((cross[0], order.sequence, cross[1], order))
+
+        fills.sort(key=lambda fill: fill[:2])
+
+        for time, sequence, price, order in fills:
+            # Limit orders, including triggered stop limit orders, are not filled past their limit by the costs of the execution model
+            limit = order.limit_price if order.order_type != 'stop' else None
+            volume = abs(self.portfolio.trade(market_object, order.side * order.get_remaining(), date, price, limit))
+
+            if volume > 0:
+                order.filled += volume
+                order.fills.append((date, price, volume))
+
+            if order.get_remaining() == 0:
+                order.status = 'filled'
+
+                # Filled orders are already out of the price heaps, but are still in the heap of expiries
+                if order.expiry_datetime != None: self.__discard(None, None)
+
+        # Orders that are still open, including stop orders that were triggered but not completely filled, go back into the book
+        for order in orders:
+            if order.is_open(): self.__push(order)
+
+        return [order for time, sequence, price, order in fills if order.fills and order.fills[-1][0] == date]
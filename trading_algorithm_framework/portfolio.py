@@ -11,30 +11,35 @@ class StockAsset:
     '''
     Create a new instance of the Stock Asset class to handle the users positions for any given symbol.
     '''
-
-    # The positions that the user has entered, and an identical history dictionary
-    positions, history = [{
-
-        # Define dictionaries to hold the users long and short positions in the given stock
-        'long' : dict(),
-        'short' : dict(),
-
-        # Define dictionaries to hold the users call and put for options stocks
-        'call' : dict(),
-        'put' : dict()
-
-    } for x in range(2)]
     
     #----------------
     # Built-in Methods
     #----------------
 
     def __init__(self):
+
+        # The positions that the user has entered, and an identical history dictionary
+        self.positions, self.history = [{
+
+            # Define dictionaries to hold the users long and short positions in the given stock
+            'long' : dict(),
+            'short' : dict(),
+
+            # Define dictionaries to hold the users call and put for options stocks
+            'call' : dict(),
+            'put' : dict()
+
+        } for x in range(2)]
         
         # Set the users exposure and returns to zero
         self.exposure = 0
         self.returns = 0
 
+        # Count the number of changes made to the positions, so that checkpoints only need to store modified assets. Also count the
+        # number of times that a record in the history was merged with another and moved to the end, since it must then be stored again.
+        self.revision = 0
+        self.merges = 0
+
         # Set a private variable to store the multiplier for options multiplier
         self.__op_mul = 100
 
@@ -45,6 +50,9 @@ class StockAsset:
     def set_opmul(self, new_opmul):
         self.__op_mul = new_opmul
 
+        # The value of every option changes with the multiplier, so recalculate the statistics from scratch
+        self.__calculate_stats()
+
     def get_opmul(self):
         return self.__op_mul
         
@@ -88,24 +96,36 @@ class StockAsset:
         put_ = self.history['put']
 
         for key in long_:
-            self.returns += long_[key].exit_price * long_[key].volume
+            self.returns += (long_[key].exit_price - long_[key].entry_price) * long_[key].volume
 
         for key in short_:
             self.returns += (short_[key].entry_price - short_[key].exit_price) * short_[key].volume
 
         for key in call_:
-            self.returns += call_[key].exit_price * call_[key].volume * self.__op_mul
+            self.returns += (call_[key].exit_price - call_[key].entry_price) * call_[key].volume * self.__op_mul
 
         for key in put_:
             self.returns += (put_[key].entry_price - put_[key].exit_price) * put_[key].volume * self.__op_mul
 
-    def __clean_positions(self):
+    def __update_stats(self, asset_type, price, volume, sign):
 
-        # Check that all stocks with volume 0 have been removed
-        for pos_type in self.positions.keys():
-            for date_key in self.positions[pos_type].keys():
-                if self.positions[pos_type][date_key].volume == 0:
-                    self.positions[pos_type].pop(date_key)
+        # Add (or with a sign of -1, remove) the contribution of an open position to the statistics, so that each fill only changes them
+        # by its own amount rather than recalculating them from every position and the whole history
+        value = price * volume * (self.__op_mul if asset_type in ['call', 'put'] else 1)
+
+        if asset_type in ['long', 'call']:
+            self.exposure += sign * value
+            self.returns -= sign * value
+
+        else: self.exposure -= sign * value
+
+    def __update_returns(self, asset_type, entry_price, exit_price, volume):
+
+        # Add the returns of a position that has been left
+        value = volume * (self.__op_mul if asset_type in ['call', 'put'] else 1)
+
+        if asset_type in ['long', 'call']: self.returns += (exit_price - entry_price) * value
+        else: self.returns += (entry_price - exit_price) * value
 
     #----------------
     # Public Methods
@@ -114,20 +134,34 @@ class StockAsset:
     # Enter a position with a stock or option
     def enter_position(self, asset_type, share, entry_datetime):
 
-        # Append the new share in the relevant list
-        self.positions[asset_type][entry_datetime] = share
+        # Shares entered at the same time as an open position are added to it at the average price, so that neither is lost. Options
+        # are only added together when they have the same expiry and style, as they could not be told apart afterwards.
+        existing = self.positions[asset_type].get(entry_datetime)
+
+        if asset_type in ['call', 'put'] and existing != None and existing.volume > 0:
+            if (existing.expiry_datetime, existing.style) != (share.expiry_datetime, share.style):
+                raise ValueError(f'A {asset_type} with a different expiry or style was already entered at {entry_datetime}!') from None
 
-        # Clear out any unwanted data in the positions dictionary
-        self.__clean_positions()
+        if existing != None and existing.volume > 0:
+            volume = existing.volume + share.volume
+            existing.price = (existing.price * existing.volume + share.price * share.volume) / volume
+            existing.volume = volume
+
+        # Otherwise append the new share in the relevant list
+        else:
+            self.positions[asset_type][entry_datetime] = share
 
-        # Calculate the new statistics
-        self.__calculate_stats()        
+        self.revision += 1
+
+        # Update the statistics with the new position
+        self.__update_stats(asset_type, share.price, share.volume, 1)
 
     # Leave a position with a stock or option
     def leave_position(self, asset_type, current_price, volume, entry_datetime, exit_datetime):
         
-        # Get the volume of the share in question
-        stored_volume = positions[asset_type][entry_datetime].volume
+        # Get the share in question, along with its volume
+        share = self.positions[asset_type][entry_datetime]
+        stored_volume = share.volume
 
         # Return if the volume is negative
         if volume <= 0: return
@@ -143,57 +177,63 @@ class StockAsset:
             # Set the stored volume to zero so that we can clear it later
             stored_volume = 0
 
-        # If we are only concerned with a regular stock
-        if asset_type in ['long', 'short']:
+        # Create the record of the transaction, for either a regular stock or an option
+        if asset_type in ['long', 'short']: record = ShareRecord(share.price, current_price, volume, entry_datetime)
+        else: record = OptionRecord(share.price, current_price, volume, entry_datetime, share.expiry_datetime, share.premium, share.style)
 
-            # Store the transaction in history
-            history[asset_type][exit_datetime] = ShareRecord(
-                positions[asset_type][entry_datetime].price,
-                current_price,
-                volume,
-                entry_datetime
-            )
+        # Combine the transaction with any other one that left at the same time, using the average prices so that the returns do not
+        # change. The combined record keeps the entry datetime of the earlier one, along with its expiry and style for options.
+        existing = self.history[asset_type].get(exit_datetime)
 
-        # If we are concerned with options
-        elif asset_type in ['call', 'put']:
+        if existing != None:
+            total = existing.volume + volume
+            record.entry_price = (existing.entry_price * existing.volume + share.price * volume) / total
+            record.exit_price = (existing.exit_price * existing.volume + current_price * volume) / total
+            record.volume = total
+            record.entry_datetime = existing.entry_datetime
 
-            # Store the transaction in history
-            history[asset_type][exit_datetime] = OptionRecord(
-                positions[asset_type][entry_datetime].price,
-                current_price,
-                volume,
-                entry_datetime,
-                positions[asset_type][entry_datetime].expiry_datetime,
-                positions[asset_type][entry_datetime].premium,
-                positions[asset_type][entry_datetime].style
-            )
+            if asset_type in ['call', 'put']:
+                record.expiry_datetime = existing.expiry_datetime
+                record.premium = existing.premium
+                record.style = existing.style
 
+            # Move the merged record to the end of the history, so that checkpoints only need to look at the end
+            self.history[asset_type].pop(exit_datetime)
+            self.merges += 1
 
-        # Clear out any unwanted data in the positions dictionary
-        self.__clean_positions()
+        # Store the transaction in history
+        self.history[asset_type][exit_datetime] = record
 
-        # Calculate the new statistics
-        self.__calculate_stats()
+        # Update the remaining volume of the position
+        share.volume = stored_volume
+        self.revision += 1
+
+        # Remove the position once all of it has been left
+        if stored_volume == 0: self.positions[asset_type].pop(entry_datetime)
+
+        # Update the statistics with the volume that was left, and its returns
+        self.__update_stats(asset_type, share.price, volume, -1)
+        self.__update_returns(asset_type, share.price, current_price, volume)
     
 class CurrencyAsset:
     '''
     Create a new instance of the Currency Asset class to handle purchasing currencies. This will utilize instances of the 'Quote' class.
     '''
     
-    # The positions that the user has entered
-    positions, history = [{
-        
-        # Define dictionaries to hold long and short positions for a currency object
-        'long' : dict(),
-        'short' : dict()
-        
-    } for x in range(2)]
-    
     #----------------
     # Built-in Methods
     #----------------
 
     def __init__(self):
+
+        # The positions that the user has entered
+        self.positions, self.history = [{
+            
+            # Define dictionaries to hold long and short positions for a currency object
+            'long' : dict(),
+            'short' : dict()
+            
+        } for x in range(2)]
         
         # Set the exposure and returns
         self.exposure = 0
@@ -205,8 +245,9 @@ class CurrencyAsset:
     
     def __calculate_stats(self):
         
-        # Reset the exposure first
+        # Reset the exposure and returns first
         self.exposure = 0
+        self.returns = 0
         
         long_ = self.positions['long']
         short_ = self.positions['short']
@@ -233,14 +274,14 @@ class CurrencyAsset:
 
         # Check that all currencies with volume 0 have been removed
         for pos_type in self.positions.keys():
-            for date_key in self.positions[pos_type].keys():
+            for date_key in list(self.positions[pos_type].keys()):
                 if self.positions[pos_type][date_key].volume == 0:
                     self.positions[pos_type].pop(date_key)
     
     def enter_position(self):
         
         # Enter a new position
-        
+        pass
         
 #----------------
 # Portfolio Class
@@ -250,21 +291,14 @@ class Portfolio:
     '''
     Create a new portfolio to purchase shares with.
     
-    Takes 2 arguments:
+    Takes 4 arguments:
 
     - balance (optional) : The money that the account begins with. Set to 50 000 by default;
-    - symbols (optional) : A list containing all of the symbols that the user wishes to trade with. Set to nothing by default, but can be changed later.
+    - symbols (optional) : A list containing all of the symbols that the user wishes to trade with. Set to nothing by default, but can be changed later;
+    - execution_model (optional) : An instance of the ExecutionModel class that decides the price, volume, and commission of every fill. Set to None by default, which fills every order in full at the close price without any costs;
+    - margin_engine (optional) : An instance of the MarginEngine class that checks every new position against the buying power and exposure limits. Set to None by default, which accepts every order.
     '''
 
-    # Declare a dictionary for each desired symbol
-    positions = dict()
-    
-    # Declare a variable to store the users total exposure
-    exposure = 0
-    
-    # Declare another dictionary to hold the holdings percentages based on exposure in the market and the users portfolio balance
-    __holdings = dict()
-
     # Declare a list of valid asset types
     __asset_types = ['long', 'short', 'call', 'put', 'currency']
     
@@ -272,15 +306,36 @@ class Portfolio:
     # Built-in Methods
     #----------------
 
-    def __init__(self, balance=50000, symbols=None):
+    def __init__(self, balance=50000, symbols=None, execution_model=None, margin_engine=None):
         
         # Validation
         gt_zero(balance)
 
-        if symbols: type_check(str, symbols)
+        if symbols: type_check(str, *symbols)
+
+        # Declare a dictionary for each desired symbol
+        self.positions = dict()
+
+        # Declare a variable to store the users total exposure
+        self.exposure = 0
+
+        # Declare another dictionary to hold the holdings percentages based on exposure in the market and the users portfolio balance
+        self.__holdings = dict()
         
-        # Set the balance
+        # Set the balance, and store the cash that the balance is calculated from
         self.balance = balance
+        self.__cash = balance
+
+        # Store the execution model, and the total commission paid through it
+        self.execution_model = execution_model
+        self.costs = 0
+
+        # Store the volume filled from the latest bar of each symbol, so that the participation cap applies to the whole bar
+        self.__filled = dict()
+
+        # Store the margin engine, and the market object of each symbol that has been traded, so that a margin call can leave any of them
+        self.margin_engine = margin_engine
+        self.__market_objects = dict()
 
         # Set the holdings percentage
         self.__calculate_stats()
@@ -294,7 +349,38 @@ class Portfolio:
     # Private Methods
     #----------------
 
+    def __get_filled(self, symbol, fill_datetime):
+        filled = self.__filled.get(symbol)
+        return filled[1] if filled != None and filled[0] == fill_datetime else 0
+
+    def __fill(self, market_object, fill_datetime, volume, side, price=None, limit=None):
+
+        # Orders are filled at the close price, unless they were given a price such as the limit of a resting order
+        point = market_object.history[fill_datetime]
+        if price == None: price = point.close_price
+
+        # Without an execution model, orders are filled in full without any costs
+        if self.execution_model == None: return price, volume, 0
+
+        filled = self.__get_filled(market_object.get_symbol(), fill_datetime)
+        price, volume, commission = self.execution_model.fill(price, volume, point.volume, side, filled, limit)
+
+        return float(price), int(volume), float(commission)
+
+    def __pay(self, symbol, fill_datetime, volume, commission):
+
+        # Take the commission out of the cash
+        self.__cash -= commission
+        self.costs += commission
+
+        # Add the volume to what has been filled from the bar
+        self.__filled[symbol] = (fill_datetime, self.__get_filled(symbol, fill_datetime) + volume)
+
     def __calculate_stats(self):
+
+        # Reset the balance and exposure first
+        self.balance = self.__cash
+        self.exposure = 0
         
         # Loop through the positions asset list
         for key in self.positions.keys():
@@ -302,12 +388,14 @@ class Portfolio:
                 self.balance += self.positions[key].returns
                 self.exposure += self.positions[key].exposure
             
-        # Now that we have the total exposure, calculate the holdings percentage
+        # Now that we have the total exposure, calculate the holdings percentage. If the exposure cancels out the balance, there is nothing to divide between the holdings.
+        total = self.exposure + self.balance
+
         for key in self.positions.keys():
-            self.__holdings[key] = self.positions[key].exposure / (self.exposure + self.balance)
+            self.__holdings[key] = self.positions[key].exposure / total if total != 0 else 0
         
         # Finally include the balance in the holdings
-        self.__holdings['portfolio'] = self.balance / (self.exposure + self.balance)
+        self.__holdings['portfolio'] = self.balance / total if total != 0 else 0
 
     #----------------
     # Getters & Setters
@@ -316,6 +404,28 @@ class Portfolio:
     def get_holdings(self):
         return self.__holdings
 
+    def get_state(self):
+        '''
+        Returns the account level state of the portfolio as a dictionary. The positions for each symbol are held by the StockAsset instances in 'positions'.
+        '''
+        state = {'cash' : self.__cash, 'costs' : self.costs}
+
+        # Include the marked prices from the margin engine, so that its totals can be rebuilt
+        if self.margin_engine != None: state['marks'] = self.margin_engine.get_marks()
+
+        return state
+
+    def set_state(self, state):
+        '''
+        Restores the account level state of the portfolio from a dictionary created by 'get_state', and recalculates the statistics from the current positions.
+        '''
+        self.__cash = state['cash']
+        self.costs = state.get('costs', 0)
+        self.__calculate_stats()
+
+        # Rebuild the running totals in the margin engine from the restored positions
+        if self.margin_engine != None: self.margin_engine.rebuild(self, state.get('marks'))
+
     #----------------
     # Public Methods
     #----------------
@@ -349,15 +459,16 @@ class Portfolio:
         '''
 
         # Set the balance
-        self.balance = new_balance
+        self.__cash = new_balance
+        self.__calculate_stats()
 
     #----------------
     # Buying & Selling
     #----------------
      
-    def buy(self, market_object, asset_type, entry_datetime, volume, stop_loss=None, take_profit=None, expiry_datetime=None, premium=0, style='us'):
+    def buy(self, market_object, asset_type, entry_datetime, volume, stop_loss=None, take_profit=None, expiry_datetime=None, premium=0, style='us', price=None, limit=None):
         '''
-        Enters a position. Takes 9 arguments:
+        Enters a position, and returns the volume that was filled. Takes 11 arguments:
 
         - market_object : The instance of the MarketObject class that the user is investing in;
         - asset_type : The type of position that the user wishes to enter. Takes 4 possible values:
@@ -376,25 +487,46 @@ class Portfolio:
         - expiry_datetime : The datetime object associated with the options expiration;
         - premium (optional) : The premium for the given option;
         - style (option) : 'us' or 'eu' styled option.
+
+        - price (optional) : The price to fill the order at, such as the limit of a resting order. Set to None by default, which fills at the close price;
+        - limit (optional) : The worst price that the order can be filled at once the costs of the execution model are added, such as the limit of a resting limit order. Set to None by default, which has no limit.
         '''
 
         # Set the symbol to be referred to later
         symbol = market_object.get_symbol()
 
+        # Fill the order, where long positions and calls buy, and short positions and puts sell
+        side = 1 if asset_type in ['long', 'call'] else -1
+        price, volume, commission = self.__fill(market_object, entry_datetime, volume, side, price, limit)
+
+        # Return if none of the order could be filled
+        if volume == 0: return 0
+
+        # Add the symbol if it does not exist
+        self.add_symbol(symbol)
+        self.__market_objects[symbol] = market_object
+
+        # Check the order against the margin engine, where options are valued using the options multiplier
+        multiplier = self.positions[symbol].get_opmul() if asset_type in self.__asset_types[2:4] else 1
+
+        if self.margin_engine != None and asset_type in self.__asset_types[:4]:
+            if not(self.margin_engine.check(self, symbol, asset_type, price, volume, multiplier, commission)): return 0
+
         # Store the equity in question
         equity = None
 
         # Check what type of asset the user needs to purchase
         if asset_type in self.__asset_types[:2]:
             equity = Share(
-                market_object.history[entry_datetime].close_price,
+                price,
                 volume,
                 stop_loss,
                 take_profit
             )
+
         elif asset_type in self.__asset_types[2:4]:
             equity = Option(
-                market_object.history[entry_datetime].close_price,
+                price,
                 volume,
                 expiry_datetime,
                 premium,
@@ -402,14 +534,10 @@ class Portfolio:
                 stop_loss,
                 take_profit
             )
-        else return
         
         # If the equity failed to populate, then prompt the user
         if not(equity): raise RuntimeError(f'Asset type {asset_type} is not recognised!') from None
 
-        # Add the symbol if it does not exist
-        self.add_symbol(symbol, )
-
         # Purchase a position in that market object
         self.positions[symbol].enter_position(
             asset_type,
@@ -417,12 +545,20 @@ class Portfolio:
             entry_datetime
         )
 
+        # Pay the commission on the order, and count its volume against the bar
+        self.__pay(symbol, entry_datetime, volume, commission)
+
+        # Update the running totals in the margin engine
+        if self.margin_engine != None: self.margin_engine.on_fill(symbol, asset_type, price, volume, price, multiplier)
+
         # Calculate the statistics
         self.__calculate_stats()
 
-    def sell(self, market_object, asset_type, entry_datetime, exit_datetime, volume):
+        return volume
+
+    def sell(self, market_object, asset_type, entry_datetime, exit_datetime, volume, price=None, limit=None):
         '''
-        Leaves a position. Takes 5 arguments:
+        Leaves a position, and returns the volume that was filled. Takes 7 arguments:
 
         - market_object : The instance of the MarketObject class that the user is pulling out of;
         - asset_type : The type of position that the user wishes to leave. Takes 4 possible values:
@@ -432,7 +568,9 @@ class Portfolio:
             - 'put' : Leave a put option.
         - entry_datetime : The datetime object associated with the time the position was entered;
         - exit_datetime : The datetime object associated with the time the position was pulled out of;
-        - volume : The number of positions that the user wishes to sell.
+        - volume : The number of positions that the user wishes to sell;
+        - price (optional) : The price to fill the order at, such as the limit of a resting order. Set to None by default, which fills at the close price;
+        - limit (optional) : The worst price that the order can be filled at once the costs of the execution model are added, such as the limit of a resting limit order. Set to None by default, which has no limit.
         '''
 
         # Get the symbol
@@ -441,10 +579,18 @@ class Portfolio:
         # Check that the user isn't trying to leave a european styled option prematurely
         if asset_type in self.__asset_types[2:4]:
             option = self.positions[symbol].positions[asset_type][entry_datetime]
-            if option.style == 'eu' and option.expiry_datetime != exit_datetime: return
+            if option.style == 'eu' and option.expiry_datetime != exit_datetime: return 0
 
-        # Get the current price
-        current_price = market_object.history[exit_datetime]['close']
+        # We can not leave more of the position than we hold
+        share = self.positions[symbol].positions[asset_type][entry_datetime]
+        volume = min(volume, share.volume)
+
+        # Fill the order on the opposite side to the one that it was entered with
+        side = -1 if asset_type in ['long', 'call'] else 1
+        current_price, volume, commission = self.__fill(market_object, exit_datetime, volume, side, price, limit)
+
+        # Return if none of the order could be filled
+        if volume <= 0: return 0
 
         # Sell the position for that symbol
         self.positions[symbol].leave_position(
@@ -454,10 +600,61 @@ class Portfolio:
             entry_datetime,
             exit_datetime
         )
+
+        # Pay the commission on the order, and count its volume against the bar
+        self.__pay(symbol, exit_datetime, volume, commission)
+
+        # Update the running totals in the margin engine
+        if self.margin_engine != None:
+            multiplier = self.positions[symbol].get_opmul() if asset_type in self.__asset_types[2:4] else 1
+            self.margin_engine.on_fill(symbol, asset_type, share.price, -volume, current_price, multiplier)
         
         # Calculate the statistics for the portfolio
         self.__calculate_stats()
 
+        return volume
+
+    def trade(self, market_object, volume, trade_datetime, price=None, limit=None):
+        '''
+        Buys or sells a number of shares, treating the long and short positions in the symbol as one net position. Buying first leaves any
+        short positions and selling first leaves any long positions, oldest first, and whatever is left enters a new position. Returns the
+        volume that was filled, which is negative for sells. Takes 5 arguments:
+
+        - market_object : The instance of the MarketObject class being traded;
+        - volume : The number of shares to buy, or a negative number to sell;
+        - trade_datetime : The datetime object associated with the time of the trade;
+        - price (optional) : The price to fill the order at, such as the limit of a resting order. Set to None by default, which fills at the close price;
+        - limit (optional) : The worst price that the order can be filled at once the costs of the execution model are added, such as the limit of a resting limit order. Set to None by default, which has no limit.
+        '''
+        type_check(int, volume)
+
+        symbol = market_object.get_symbol()
+        side = 1 if volume > 0 else -1
+
+        remaining = abs(volume)
+        filled = 0
+
+        # Leave the positions on the opposite side first, oldest first
+        leave = 'short' if side == 1 else 'long'
+
+        if symbol in self.positions:
+            for entry_datetime in list(self.positions[symbol].positions[leave].keys()):
+                if remaining == 0: break
+
+                leave_volume = min(remaining, self.positions[symbol].positions[leave][entry_datetime].volume)
+                left = self.sell(market_object, leave, entry_datetime, trade_datetime, leave_volume, price, limit)
+
+                remaining -= left
+                filled += left
+
+                # Stop once the execution model can not fill any more
+                if left < leave_volume: return side * filled
+
+        # Enter a new position with what is left
+        if remaining > 0: filled += self.buy(market_object, 'long' if side == 1 else 'short', trade_datetime, remaining, price=price, limit=limit)
+
+        return side * filled
+
     def sell_all(self, market_object, asset_type, exit_datetime):
         '''
         Sell all positions for a given asset type. Takes 3 arguments:
@@ -479,10 +676,10 @@ class Portfolio:
         if asset_type in self.__asset_types[0:4]:
 
             # Loop for each datetime object in the StockAsset instance
-            for entry_datetime in self.positions[symbol].positions.keys():
+            for entry_datetime in list(self.positions[symbol].positions[asset_type].keys()):
 
                 # Get the maximum volume
-                volume = self.positions[symbol].positions[entry_datetime].volume
+                volume = self.positions[symbol].positions[asset_type][entry_datetime].volume
 
                 # Sell the object
                 self.sell(market_object, asset_type, entry_datetime, exit_datetime, volume)
@@ -493,3 +690,33 @@ class Portfolio:
             for asset_type in self.__asset_types[0:4]:
                 
                 self.sell_all(market_object, asset_type, exit_datetime)
+
+    #----------------
+    # Margin
+    #----------------
+
+    def mark(self, market_object, mark_datetime):
+        '''
+        Value the open positions in a market object at the close of a bar, and leave positions until the margin is covered again if the
+        portfolio is then in a margin call. Call this once for each symbol on every new bar. Does nothing without a margin engine. Returns
+        True if positions were left to meet a margin call. Takes 2 arguments:
+
+        - market_object : The instance of the MarketObject class being valued;
+        - mark_datetime : The datetime object of the bar, such as the one returned by 'MarketObject.step'.
+        '''
+        if self.margin_engine == None: return False
+
+        # Remember the market object, as positions restored from a checkpoint were not entered through 'buy'
+        symbol = market_object.get_symbol()
+        self.__market_objects[symbol] = market_object
+
+        self.margin_engine.mark(symbol, market_object.history[mark_datetime].close_price)
+
+        if not(self.margin_engine.in_margin_call(self)): return False
+
+        # Positions can be left in any symbol that has been traded or marked, as long as it has a bar at the same time
+        market_objects = [other for other in self.__market_objects.values() if mark_datetime in other.history]
+
+        self.margin_engine.liquidate(self, market_objects, mark_datetime)
+
+        return True
@@ -0,0 +1,309 @@
+# The file for replaying market data as though it were a live feed
+import asyncio
+import inspect
+import json
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from trading_algorithm_framework.validation import *
+from trading_algorithm_framework.stock import *
+
+#----------------
+# Statistics
+#----------------
+
+class ReplayStats:
+    '''
+    Holds the latency and throughput statistics for a replay. All times are measured in seconds.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self):
+
+        # The number of bars received
+        self.count = 0
+
+        # For each bar, the time from being sent to being received, and from being sent to the strategy returning
+        self.latencies = []
+        self.tick_to_order = []
+
+        # The times that the first and last bars were received
+        self.__start = None
+        self.__end = None
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __percentile(self, values, q):
+        if not(values): return None
+        values = sorted(values)
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def record(self, sent, received, finished):
+        '''
+        Record the times for one bar. Takes 3 arguments:
+
+        - sent : The time that the server sent the bar;
+        - received : The time that the client received the bar;
+        - finished : The time that the strategy finished with the bar.
+        '''
+        if self.__start == None: self.__start = received
+        self.__end = finished
+
+        self.count += 1
+        self.latencies.append(received - sent)
+        self.tick_to_order.append(finished - sent)
+
+    def throughput(self):
+        '''
+        Returns the number of bars handled per second.
+        '''
+        if self.count == 0 or self.__end == self.__start: return 0
+        return self.count / (self.__end - self.__start)
+
+    def summary(self):
+        '''
+        Returns a dictionary of the count, the throughput, and the median and 99th percentile of the latency and tick-to-order times.
+        '''
+        return {
+            'count' : self.count,
+            'throughput' : self.throughput(),
+            'latency_p50' : self.__percentile(self.latencies, 0.5),
+            'latency_p99' : self.__percentile(self.latencies, 0.99),
+            'tick_to_order_p50' : self.__percentile(self.tick_to_order, 0.5),
+            'tick_to_order_p99' : self.__percentile(self.tick_to_order, 0.99)
+        }
+
+#----------------
+# Replay Server
+#----------------
+
+class ReplayServer:
+    '''
+    Create a new replay server to stream bars in the order that they happened. Takes 4 arguments:
+
+    - source : Either an instance of the MarketObject class, or the path to a csv file laid out as described in the MarketObject docstring. A csv file is read in chunks, so it is never held in memory all at once;
+    - speed (optional) : How many times faster than real time the bars are sent, e.g. 60 sends an hour of minute bars every minute. Set to None by default, which sends the bars as fast as the client can take them;
+    - date_format (optional) : Denotes the arrangement of the dates in a csv file. Set to '%Y-%m-%d' by default;
+    - chunksize (optional) : The number of rows read from a csv file at a time. Set to 10 000 by default.
+
+    Bars are sent as dictionaries holding the 'date', 'volume', 'close', 'open', 'low' and 'high' of the bar, along with the time that it was 'sent'.
+    '''
+
+    # Declare the fields sent with each bar
+    __headings = ['volume', 'close', 'open', 'low', 'high']
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, source, speed=None, date_format='%Y-%m-%d', chunksize=10000):
+
+        # Validation
+        if speed != None: gt_zero(speed)
+        type_check(str, date_format)
+        gt_zero(chunksize)
+
+        self.source = source
+        self.speed = speed
+        self.date_format = date_format
+        self.chunksize = chunksize
+
+        # The total time spent waiting for the client to catch up
+        self.stalled = 0
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __bars(self):
+
+        # Yield each bar from a market object
+        if isinstance(self.source, MarketObject):
+            for date in self.source.get_dates():
+                point = self.source.history[date]
+                yield date, [point.volume, point.close_price, point.open_price, point.low_price, point.high_price]
+
+        # Otherwise read the csv file in chunks
+        else:
+            for chunk in pd.read_csv(self.source, index_col=0, chunksize=self.chunksize):
+                dates = pd.to_datetime(chunk.index, format=self.date_format).to_pydatetime()
+                columns = [chunk[heading].tolist() for heading in self.__headings]
+
+                for date, *values in zip(dates, *columns):
+                    yield date, values
+
+    async def __stream(self, send):
+
+        previous = None
+
+        for date, values in self.__bars():
+
+            # Wait for the time between the bars, scaled by the speed
+            if self.speed != None and previous != None:
+                await asyncio.sleep(max((date - previous).total_seconds() / self.speed, 0))
+
+            previous = date
+
+            bar = dict(zip(self.__headings, values))
+            bar['date'] = date
+            bar['sent'] = time.time()
+
+            # Sending blocks while the client is behind, which is recorded as time stalled
+            start = time.perf_counter()
+            await send(bar)
+            self.stalled += time.perf_counter() - start
+
+    async def __handle(self, reader, writer):
+
+        async def send(bar):
+            bar['date'] = bar['date'].isoformat()
+            writer.write((json.dumps(bar) + '\n').encode())
+            await writer.drain()
+
+        try:
+            await self.__stream(send)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    async def stream(self, queue):
+        '''
+        Put every bar into an asyncio queue, followed by None once all of the bars have been sent. If the queue has a maximum size, the server waits whenever the queue is full. Takes 1 argument:
+
+        - queue : An instance of asyncio.Queue.
+        '''
+        await self.__stream(queue.put)
+        await queue.put(None)
+
+    async def serve(self, host='127.0.0.1', port=0):
+        '''
+        Start serving the bars over a socket, as one line of json for each bar. Every client that connects receives the whole replay. Returns the asyncio server, whose port can be found from 'server.sockets[0].getsockname()[1]'. Takes 2 arguments:
+
+        - host (optional) : The host to serve on. Set to '127.0.0.1' by default;
+        - port (optional) : The port to serve on. Set to 0 by default, which picks a free port.
+        '''
+        return await asyncio.start_server(self.__handle, host, port)
+
+#----------------
+# Replay Client
+#----------------
+
+class ReplayClient:
+    '''
+    Create a new replay client to receive bars, add them to a MarketObject, and pass them to a strategy. Takes 2 arguments:
+
+    - symbol : The symbol of the market object that the bars are added to;
+    - on_bar : The strategy callback. It is called as on_bar(market_object, date, point) for each bar, and may be a coroutine.
+
+    The MarketObject is created when the first bar arrives, and can be found in 'client.market_object'. The latency and throughput
+    statistics are kept in 'client.stats'.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, symbol, on_bar):
+
+        # Validation
+        type_check(str, symbol)
+
+        self.symbol = symbol
+        self.on_bar = on_bar
+
+        self.market_object = None
+        self.stats = ReplayStats()
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    async def __receive(self, bar):
+        received = time.time()
+
+        # Add the bar to the market object
+        sent = bar.pop('sent')
+        date = bar.pop('date')
+        data = pd.DataFrame([bar], index=[date])
+
+        if self.market_object == None: self.market_object = MarketObject(self.symbol, data)
+        else: self.market_object.update_history(data)
+
+        # Pass the bar to the strategy
+        result = self.on_bar(self.market_object, date, self.market_object.history[date])
+        if inspect.isawaitable(result): await result
+
+        self.stats.record(sent, received, time.time())
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    async def consume(self, queue):
+        '''
+        Receive bars from an asyncio queue until None is received. Takes 1 argument:
+
+        - queue : The instance of asyncio.Queue that a ReplayServer is streaming to.
+        '''
+        while True:
+            bar = await queue.get()
+            if bar == None: return
+
+            await self.__receive(bar)
+
+    async def connect(self, host, port):
+        '''
+        Receive bars from a ReplayServer over a socket until the server closes the connection. Takes 2 arguments:
+
+        - host : The host that the server is running on;
+        - port : The port that the server is running on.
+        '''
+        reader, writer = await asyncio.open_connection(host, port)
+
+        try:
+            async for line in reader:
+                bar = json.loads(line)
+                bar['date'] = datetime.fromisoformat(bar['date'])
+
+                await self.__receive(bar)
+        finally:
+            writer.close()
+
+#----------------
+# Functions
+#----------------
+
+async def run_replay(source, symbol, on_bar, speed=None, maxsize=100):
+    '''
+    Replay bars from a source to a strategy through a queue, and return the ReplayClient once every bar has been handled. Takes 5 arguments:
+
+    - source : The source of the bars, as described in the ReplayServer docstring;
+    - symbol : The symbol of the market object that the bars are added to;
+    - on_bar : The strategy callback, as described in the ReplayClient docstring;
+    - speed (optional) : How many times faster than real time the bars are sent. Set to None by default, which is as fast as possible;
+    - maxsize (optional) : The largest number of bars waiting in the queue before the server waits for the client. Set to 100 by default.
+    '''
+    queue = asyncio.Queue(maxsize)
+
+    server = ReplayServer(source, speed)
+    client = ReplayClient(symbol, on_bar)
+
+    await asyncio.gather(server.stream(queue), client.consume(queue))
+
+    return client
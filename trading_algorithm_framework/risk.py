@@ -0,0 +1,201 @@
+# The file for measuring the risk of a portfolio from the rolling returns of its symbols
+from statistics import NormalDist
+
+import numpy as np
+
+from trading_algorithm_framework.validation import *
+from trading_algorithm_framework.portfolio import *
+
+#----------------
+# Risk Model
+#----------------
+
+class RiskModel:
+    '''
+    Create a new risk model that keeps the rolling mean and covariance of the returns of a set of symbols. The running sums are updated
+    as each bar is added and the oldest bar leaves the window, so each update takes O(k^2) time for k symbols no matter how long the
+    window is. The sums are rebuilt from the stored returns once every window, so that rounding errors do not build up.
+
+    Takes 3 arguments:
+
+    - symbols : A list of the symbols whose returns are tracked;
+    - window (optional) : The number of bars in the rolling window. Set to 252 by default;
+    - benchmark (optional) : The symbol of a benchmark, such as an index, used to calculate the beta of the portfolio. Set to None by default.
+    '''
+
+    #----------------
+    # Built-in Methods
+    #----------------
+
+    def __init__(self, symbols, window=252, benchmark=None):
+
+        # Validation
+        type_check(str, *symbols)
+        type_check(int, window)
+        if window < 2: raise ValueError(f'Window {window} must hold at least two bars!') from None
+
+        if benchmark != None: type_check(str, benchmark)
+
+        self.symbols = list(symbols)
+        self.window = window
+        self.benchmark = benchmark
+
+        # The benchmark is tracked as an extra column after the symbols
+        k = len(self.symbols) + (benchmark != None)
+        self.__columns = {symbol : i for i, symbol in enumerate(self.symbols)}
+
+        # Store the returns in the window as a ring buffer, along with the running sums
+        self.__returns = np.zeros((window, k))
+        self.__sum = np.zeros(k)
+        self.__products = np.zeros((k, k))
+
+        # The number of bars in the window, the total number of bars added, and the last price of each symbol
+        self.count = 0
+        self.__added = 0
+        self.__prices = dict()
+
+    #----------------
+    # Private Methods
+    #----------------
+
+    def __weights(self, weights):
+
+        # Use the holdings of a portfolio as its weights
+        if isinstance(weights, Portfolio): weights = weights.get_holdings()
+
+        vector = np.zeros(len(self.__sum))
+        for symbol, weight in weights.items():
+            if symbol in self.__columns: vector[self.__columns[symbol]] = weight
+
+        return vector
+
+    def __portfolio_moments(self, weights):
+        w = self.__weights(weights)
+        return w @ self.get_mean(), np.sqrt(max(w @ self.get_covariance() @ w, 0))
+
+    def __portfolio_returns(self, weights):
+
+        # The returns of the portfolio over the window, if it had held the weights throughout
+        return self.__returns[:self.count] @ self.__weights(weights)
+
+    #----------------
+    # Getters & Setters
+    #----------------
+
+    def get_mean(self):
+        return self.__sum / self.count if self.count else self.__sum
+
+    def get_covariance(self):
+        if self.count < 2: return np.zeros(self.__products.shape)
+        return (self.__products - np.outer(self.__sum, self.__sum) / self.count) / (self.count - 1)
+
+    #----------------
+    # Public Methods
+    #----------------
+
+    def update(self, returns, benchmark_return=None):
+        '''
+        Add the returns for a new bar. Takes 2 arguments:
+
+        - returns : A dictionary of the return of each symbol over the bar, as a fraction. Symbols that are left out are given a return of zero;
+        - benchmark_return (optional) : The return of the benchmark over the bar. Set to None by default.
+        '''
+        r = np.zeros(len(self.__sum))
+
+        for symbol, value in returns.items():
+            if symbol in self.__columns: r[self.__columns[symbol]] = value
+
+        if self.benchmark != None: r[-1] = benchmark_return if benchmark_return != None else 0
+
+        # Remove the oldest bar once the window is full
+        slot = self.__added % self.window
+
+        if self.count == self.window:
+            old = self.__returns[slot]
+            self.__sum -= old
+            self.__products -= np.outer(old, old)
+        else:
+            self.count += 1
+
+        # Add the new bar
+        self.__returns[slot] = r
+        self.__sum += r
+        self.__products += np.outer(r, r)
+        self.__added += 1
+
+        # Rebuild the sums once every window
+        if self.__added % self.window == 0:
+            returns = self.__returns[:self.count]
+            self.__sum = returns.sum(axis=0)
+            self.__products = returns.T @ returns
+
+    def update_prices(self, prices, benchmark_price=None):
+        '''
+        Add a new bar from the prices of each symbol, such as the close prices of each MarketObject. The returns are calculated from the last prices that were added. Takes 2 arguments:
+
+        - prices : A dictionary of the price of each symbol;
+        - benchmark_price (optional) : The price of the benchmark. Set to None by default.
+        '''
+        if self.benchmark != None and benchmark_price != None: prices = dict(prices, **{self.benchmark : benchmark_price})
+
+        # The first prices only set the starting point
+        returns = {symbol : price / self.__prices[symbol] - 1 for symbol, price in prices.items() if symbol in self.__prices}
+        first = not(self.__prices)
+
+        self.__prices.update(prices)
+        if first: return
+
+        self.update(returns, returns.pop(self.benchmark, None) if self.benchmark != None else None)
+
+    def volatility(self, weights):
+        '''
+        Returns the volatility of the portfolio over one bar. Takes 1 argument:
+
+        - weights : Either a dictionary of the weight of each symbol, or an instance of the Portfolio class, whose holdings are used.
+        '''
+        return self.__portfolio_moments(weights)[1]
+
+    def var(self, weights, confidence=0.95, method='parametric'):
+        '''
+        Returns the value at risk of the portfolio over one bar, as a positive fraction of its value. Takes 3 arguments:
+
+        - weights : Either a dictionary of the weight of each symbol, or an instance of the Portfolio class, whose holdings are used;
+        - confidence (optional) : The confidence level. Set to 0.95 by default;
+        - method (optional) : Either 'parametric', which assumes normally distributed returns, or 'historical', which uses the returns in the window. Set to 'parametric' by default.
+        '''
+        if method == 'parametric':
+            mean, std = self.__portfolio_moments(weights)
+            return std * NormalDist().inv_cdf(confidence) - mean
+
+        elif method == 'historical':
+            return -np.quantile(self.__portfolio_returns(weights), 1 - confidence)
+
+        raise ValueError(f'Method {method} is not recognised!') from None
+
+    def expected_shortfall(self, weights, confidence=0.95, method='parametric'):
+        '''
+        Returns the expected shortfall of the portfolio over one bar, which is the average loss beyond the value at risk, as a positive fraction of its value. Takes the same 3 arguments as 'var'.
+        '''
+        if method == 'parametric':
+            mean, std = self.__portfolio_moments(weights)
+            z = NormalDist().inv_cdf(confidence)
+            return std * NormalDist().pdf(z) / (1 - confidence) - mean
+
+        elif method == 'historical':
+            returns = self.__portfolio_returns(weights)
+            return -returns[returns <= np.quantile(returns, 1 - confidence)].mean()
+
+        raise ValueError(f'Method {method} is not recognised!') from None
+
+    def beta(self, weights):
+        '''
+        Returns the beta of the portfolio to the benchmark. Takes 1 argument:
+
+        - weights : Either a dictionary of the weight of each symbol, or an instance of the Portfolio class, whose holdings are used.
+        '''
+        if self.benchmark == None: raise RuntimeError('The risk model does not have a benchmark!') from None
+
+        covariance = self.get_covariance()
+        if covariance[-1, -1] == 0: return 0
+
+        return self.__weights(weights) @ covariance[:, -1] / covariance[-1, -1]
@@ -1,8 +1,10 @@
-from datetime import datetime
-
 from trading_algorithm_framework.validation import *
+from trading_algorithm_framework.actions import *
 
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
 
 
 class Point:
@@ -31,8 +33,9 @@ class Point:
         # Store all values, and convert them appropriately
         self.volume = int(volume)
         self.close_price = float(close_price)
-        self.open_price = float(open_price)
-        self.high_price = float(high_price)
+        self.open_price = float(open_price) if open_price != None else None
+        self.low_price = float(low_price) if low_price != None else None
+        self.high_price = float(high_price) if high_price != None else None
 
 
 class MarketObject:
@@ -50,6 +53,9 @@ class MarketObject:
         - low : The minimum price that a given market object sold for on a given day;
         - high : The maximum price that a given market object sold for on a given day.
     - date_format (optional) : Denotes the arrangement of the dates. Set to '%Y-%m-%d' by default.
+
+    The prices are stored exactly as they are loaded. Splits and dividends are added to the 'actions' attribute, an instance of the
+    CorporateActions class, which returns adjusted prices without changing the stored ones.
     '''
 
     #----------------
@@ -62,16 +68,6 @@ class MarketObject:
     # Declare the name of the ticker
     __symbol = None
 
-    #----------------
-    # Public Attributes
-    #----------------
-
-    # Declare a dictionary of dates as keys, and points as the corresponding data
-    history = dict()
-
-    # Declare a dataframe version of the history variable
-    history_df = None
-
     #----------------
     # Built-in Methods
     #----------------
@@ -82,6 +78,28 @@ class MarketObject:
         type_check(str, symbol, date_format)
         type_check(pd.DataFrame, data)
 
+        # Declare a dictionary of dates as keys, and points as the corresponding data
+        self.history = dict()
+
+        # Declare the columns of the history as arrays with room to grow, so that appending a bar does not copy the whole history. The
+        # dataframe version of the history is only built from them when it is read.
+        self.__index = np.empty(0, dtype='datetime64[ns]')
+        self.__columns = {heading : np.empty(0) for heading in self.__headings}
+        self.__rows = 0
+        self.__tz = None
+        self.__history_df = None
+
+        # Declare a list of the dates in the order that they were added, and a cursor holding the index of the next date to be stepped through
+        self.__dates = []
+        self.cursor = 0
+
+        # Declare a dictionary to cache resampled bars for each timeframe, along with the number of rows they were built from and the
+        # date of the first row in the last bar
+        self.__timeframes = dict()
+
+        # Declare the splits and dividends, which are used to adjust the prices
+        self.actions = CorporateActions(self)
+
         # Store all data
         self.set_symbol(symbol)
         self.update_history(data, date_format)
@@ -97,6 +115,38 @@ class MarketObject:
     def set_symbol(self, symbol):
         if not(self.__symbol):
             self.__symbol = symbol
+
+    # Dates
+    def get_dates(self):
+        return self.__dates
+
+    # History
+    @property
+    def history_df(self):
+        '''
+        A dataframe of the history, indexed by date in order. It is rebuilt from the stored columns after they change, so it should not be modified.
+        '''
+        if self.__history_df is None:
+            self.__history_df = pd.DataFrame(
+                {heading : self.__columns[heading][:self.__rows] for heading in self.__headings},
+                index=self.__get_index(0)
+            )
+
+        return self.__history_df
+
+    def get_index(self):
+        '''
+        Returns a numpy array of the dates in the history, in the order of 'history_df', without building the dataframe.
+        '''
+        return self.__index[:self.__rows]
+
+    def get_column(self, heading):
+        '''
+        Returns a numpy array of one column of the history, in the order of 'history_df', without building the dataframe. Takes 1 argument:
+
+        - heading : Either 'volume', 'close', 'open', 'low' or 'high'.
+        '''
+        return self.__columns[heading][:self.__rows]
     
     #----------------
     # Private Methods
@@ -111,13 +161,85 @@ class MarketObject:
         # If there is a false in there, then the validation has failed
         return(not(False in check))
 
+    # A private method to return the stored dates from a row onwards as a pandas index, in the time zone of the data
+    def __get_index(self, start):
+        index = pd.DatetimeIndex(self.__index[start:self.__rows], name='date')
+        return index.tz_localize('UTC').tz_convert(self.__tz) if self.__tz != None else index
+
+    # A private method to replace the stored columns with those of a dataframe. Dates are stored in UTC if they have a time zone.
+    def __set_columns(self, data):
+        self.__tz = data.index.tz
+        self.__index = data.index.to_numpy(dtype='datetime64[ns]')
+        self.__columns = {heading : data[heading].to_numpy() for heading in self.__headings}
+        self.__rows = len(data)
+
+    # A private method to add new rows to the end of the stored columns, doubling their size whenever they are full. Takes the dates
+    # and a list of the values in the order of the headings.
+    def __append_columns(self, index, values):
+        rows = self.__rows + len(index)
+
+        if rows > len(self.__index):
+            size = max(rows, 2 * len(self.__index), 16)
+
+            dates = np.empty(size, dtype='datetime64[ns]')
+            dates[:self.__rows] = self.__index[:self.__rows]
+            self.__index = dates
+
+            for heading in self.__headings:
+                column = np.empty(size, dtype=self.__columns[heading].dtype)
+                column[:self.__rows] = self.__columns[heading][:self.__rows]
+                self.__columns[heading] = column
+
+        self.__index[self.__rows:rows] = index.to_numpy(dtype='datetime64[ns]')
+
+        for heading, column in zip(self.__headings, values):
+
+            # Widen the stored column if the new values do not fit in its type
+            if not(np.can_cast(column.dtype, self.__columns[heading].dtype, casting='safe')):
+                self.__columns[heading] = self.__columns[heading].astype(np.result_type(self.__columns[heading], column))
+
+            self.__columns[heading][self.__rows:rows] = column
+
+        self.__rows = rows
+
+    # A private method to return the rows of the history from a date onwards, without building the whole dataframe
+    def __get_rows(self, start):
+        i = int(self.get_index().searchsorted(pd.Timestamp(start).to_datetime64(), side='left'))
+        return pd.DataFrame({heading : self.__columns[heading][i:self.__rows] for heading in self.__headings}, index=self.__get_index(i))
+
+    # A private method to aggregate bars into a longer interval. Returns the bars, along with the date of the first row in each bar.
+    def __aggregate(self, data, interval, session, offset):
+
+        # Only include bars inside of the trading session
+        if session != None: data = data.between_time(*session)
+
+        # Fixed length bins are measured from a fixed origin, so that bars built from part of the history line up with bars built from all of it
+        origin = 'epoch' if isinstance(to_offset(interval), Tick) else 'start_day'
+
+        data = data[self.__headings].assign(start=data.index)
+
+        bars = data.resample(interval, origin=origin, offset=offset).agg({
+            'volume' : 'sum',
+            'close' : 'last',
+            'open' : 'first',
+            'low' : 'min',
+            'high' : 'max',
+            'start' : 'first'
+        })
+
+        # Remove intervals that do not contain any bars
+        bars = bars[bars['close'].notna()]
+
+        return bars[self.__headings], bars['start']
+
     #----------------
     # Public Methods
     #----------------
 
     def update_history(self, data, date_format='%Y-%m-%d'):
         '''
-        Update all of the records in the class instance.
+        Update all of the records in the class instance. New dates are appended to the history, and existing dates are overwritten.
+        The dates are always kept in order, so adding dates before the cursor moves the dates after them along by one.
 
         We assume that the date format is set to the default, however the user may change it if necessary.
 
@@ -129,24 +251,129 @@ class MarketObject:
          # Verify that the dataframe headings are formatted correctly
         if not(self.__verify_headings(data.columns)): 
             raise ValueError('Headings do not line up!') from None
+
+        # Convert the dates so that they are all date objects
+        data = data.copy()
+        data.index = pd.to_datetime(data.index, format=date_format) if data.index.dtype == object else pd.to_datetime(data.index)
+
+        # Check whether the new data comes after the existing data. If not, any resampled bars will need to be rebuilt.
+        last_date = self.__index[self.__rows - 1] if self.__rows != 0 else None
+
+        appended = data.index.is_monotonic_increasing and data.index.is_unique and (last_date is None or len(data) == 0 or data.index[0].to_datetime64() > last_date)
+        if not(appended): self.__timeframes.clear()
         
         # Store each point for the market object
-        for index, row in data.iterrows():
-            
-            # Convert the date so that it is a date object
-            new_date = datetime.strptime(index, date_format) if type(index) == str else index
+        columns = [data[heading].to_numpy() for heading in self.__headings]
+        dates = data.index.to_pydatetime()
+
+        for new_date, volume, close_price, open_price, low_price, high_price in zip(dates, *columns):
 
             # Define a new point
-            new_point = Point(
-                row[self.__headings[0]],
-                row[self.__headings[1]],
-                row[self.__headings[2]],
-                row[self.__headings[3]],
-                row[self.__headings[4]]
-            )
+            new_point = Point(int(volume), close_price, open_price, low_price, high_price)
 
             # Store each point in the dictionary
             self.history[new_date] = new_point
 
-        # Store the dataframe as its own object
-        self.history_df = data
\ No newline at end of file
+        # Store the new rows, with any overwritten dates replaced by the new data, and keep the dates in order
+        if appended:
+            if self.__rows == 0: self.__set_columns(data)
+            elif len(data) != 0: self.__append_columns(data.index, columns)
+
+            self.__history_df = None
+
+            self.__dates.extend(dates)
+
+        else:
+            history_df = data[self.__headings] if self.__rows == 0 else pd.concat([self.history_df, data[self.__headings]])
+            history_df = history_df[~history_df.index.duplicated(keep='last')].sort_index()
+
+            self.__set_columns(history_df)
+            self.__history_df = None
+
+            # Move the cursor past any dates added before it, so that stepping never returns a date again
+            if self.cursor != 0: self.cursor = int(self.get_index().searchsorted(pd.Timestamp(self.__dates[self.cursor - 1]).to_datetime64(), side='right'))
+
+            # Update the list of dates in place, so that any reference to it stays up to date
+            self.__dates[:] = history_df.index.to_pydatetime()
+
+        # Dividends after the new data are measured against closes that may have changed or been added, including dividends
+        # announced for dates after the end of the history
+        if len(data) != 0: self.actions.refresh(data.index.min())
+
+    def resample(self, interval, session=None, offset=None):
+        '''
+        Returns a dataframe of bars over a longer interval, built from the bars stored in the history. Each bar takes the first open, the
+        maximum high, the minimum low, the last close, and the total volume of the bars that it covers, and is indexed by the time it starts.
+        Intervals without any bars (such as weekends) are left out.
+
+        The result is cached for each timeframe, and only the last bar is rebuilt when 'update_history' appends new bars. The returned
+        dataframe is the cached copy, so it should not be modified.
+
+        Takes 3 arguments:
+
+        - interval : The length of each bar as a pandas frequency string, e.g. '5min', '1h', '1D' or 'W';
+        - session (optional) : A tuple of the ('start', 'end') times of the trading session, e.g. ('09:30', '16:00'). Bars outside of the session are ignored. Set to None by default;
+        - offset (optional) : Shifts the start of each bar, e.g. '30min' so that hourly bars line up with a 09:30 open. Set to None by default.
+        '''
+
+        # Validation
+        type_check(str, interval)
+        if session != None: type_check(str, *session)
+        if offset != None: type_check(str, offset)
+
+        key = (interval, session, offset)
+        rows = self.__rows
+
+        # Nothing has changed since the bars were last built
+        if key in self.__timeframes and self.__timeframes[key][1] == rows: return self.__timeframes[key][0]
+
+        # If some bars were built already, only the last bar can have changed, so rebuild from its first row. The label of a bar is not
+        # always its start, since intervals such as 'W' and 'ME' are labelled by their end.
+        if key in self.__timeframes and len(self.__timeframes[key][0]) != 0:
+            bars, rows_, start = self.__timeframes[key]
+            new_bars, starts = self.__aggregate(self.__get_rows(start), interval, session, offset)
+            bars = pd.concat([bars.iloc[:-1], new_bars])
+
+        else:
+            bars, starts = self.__aggregate(self.history_df, interval, session, offset)
+
+        self.__timeframes[key] = (bars, rows, starts.iloc[-1] if len(starts) else None)
+
+        return bars
+
+    #----------------
+    # Cursor Methods
+    #----------------
+
+    def has_next(self):
+        '''
+        Returns True if there are still dates left for the cursor to step through.
+        '''
+        return self.cursor < len(self.__dates)
+
+    def step(self):
+        '''
+        Returns the date and Point at the cursor as a tuple, and then moves the cursor forward by one.
+        '''
+
+        # Check that there is a date left to step to
+        if not(self.has_next()): raise IndexError(f'Cursor {self.cursor} is at the end of the history!') from None
+
+        # Get the date, and move the cursor forwards
+        date = self.__dates[self.cursor]
+        self.cursor += 1
+
+        return date, self.history[date]
+
+    def seek(self, cursor=0):
+        '''
+        Moves the cursor to a given index in the history. Takes 1 argument:
+
+        - cursor (optional) : The index of the next date to be stepped through. Set to 0 by default.
+        '''
+
+        # Validation
+        type_check(int, cursor)
+        if cursor < 0 or cursor > len(self.__dates): raise IndexError(f'Cursor {cursor} is out of range!') from None
+
+        self.cursor = cursor
\ No newline at end of file
@@ -16,7 +16,7 @@ def gte_zero(*args):
     '''
     if len(args) != 0:
         for arg in args:
-            if arg <= 0: raise ValueError(f'Value {arg} must be strictly greater than zero!') from None          
+            if arg < 0: raise ValueError(f'Value {arg} must be greater than or equal to zero!') from None          
 
 #----------------
 # Type Validation